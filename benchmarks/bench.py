@@ -0,0 +1,280 @@
+""" Benchmarks of the mcpi client hot paths.
+
+        python benchmarks/bench.py -o results.json
+        python benchmarks/bench.py --compare results.json
+
+    The protocol benchmarks run against mcpi.mockserver, started as a
+    separate process so it does not share the interpreter lock with the
+    client, or against a server given with --address and --port. They
+    overwrite blocks near the origin, spawn entities and remove every
+    entity in the world, so against a real game they only run when
+    --destructive is given as well. The rest are microbenchmarks of the
+    client side encoding and parsing.
+
+    Each benchmark reports operations per second and the p50 and p99 time
+    of one operation in microseconds. Results are written as JSON along with
+    the version and git revision of the checkout being benchmarked and the
+    Python version. --compare reads an earlier results file
+    and exits with status 1 if any benchmark's throughput has dropped by
+    more than --tolerance."""
+
+import argparse
+import json
+import os
+import platform
+import re
+import socket
+import subprocess
+import sys
+import time
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, root)
+
+from mcpi import block
+from mcpi.minecraft import Minecraft, intFloor
+from mcpi.parse import parseBlockHits, parseEntities
+from mcpi.util import flatten_parameters_to_bytestring
+from mcpi.vec3 import Vec3
+
+clock = time.perf_counter
+
+def percentile(samples, p):
+    """The p-th percentile of sorted samples"""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100.0))]
+
+def summarize(name, samples, total, operations):
+    """Summarize per operation times (seconds) => result dict"""
+    samples = sorted(samples)
+    return {
+        "name": name,
+        "operations": operations,
+        "seconds": total,
+        "opsPerSecond": operations / total if total else 0.0,
+        "p50us": percentile(samples, 50) * 1e6,
+        "p99us": percentile(samples, 99) * 1e6,
+    }
+
+def timeCalls(name, func, count, sync=None, batch=1):
+    """Time count calls of func, each doing batch operations. sync is called
+    once at the end, e.g. to wait for the server to catch up with commands
+    which do not reply."""
+    samples = []
+    start = clock()
+    for _ in range(count):
+        t = clock()
+        func()
+        samples.append((clock() - t) / batch)
+    if sync is not None:
+        sync()
+    return summarize(name, samples, clock() - start, count * batch)
+
+def timeMicro(name, func, count, repeat=20):
+    """Time func in repeat rounds of count / repeat calls, for functions too
+    quick to time one call at a time"""
+    inner = max(1, count // repeat)
+    samples = []
+    start = clock()
+    for _ in range(repeat):
+        t = clock()
+        for _ in range(inner):
+            func()
+        samples.append((clock() - t) / inner)
+    return summarize(name, samples, clock() - start, inner * repeat)
+
+def protocolBenchmarks(mc, scale):
+    """Benchmarks which talk to a server"""
+    results = []
+    sync = lambda: mc.getBlock(0, 0, 0)
+    n = int(2000 * scale)
+
+    i = [0]
+    def setBlock():
+        i[0] += 1
+        mc.setBlock(i[0] % 64, 10 + (i[0] // 64) % 16, 0, block.STONE.id)
+    results.append(timeCalls("setBlock", setBlock, n, sync))
+
+    def setBlocks():
+        i[0] += 1
+        x = (i[0] % 8) * 16
+        mc.setBlocks(x, 10, 20, x + 15, 25, 35, block.WOOL.id, i[0] % 16)
+    results.append(timeCalls("setBlocks 16x16x16", setBlocks, max(1, n // 20), sync))
+
+    results.append(timeCalls("getBlock", lambda: mc.getBlock(1, 10, 0), n))
+    results.append(timeCalls("getBlockWithData", lambda: mc.getBlockWithData(1, 10, 20), n))
+
+    size = 32
+    volume = size ** 3
+    results.append(timeCalls("getBlocks 32x32x32 (per block)",
+                             lambda: mc.getBlocksArray(0, 0, 0, size - 1, size - 1, size - 1),
+                             max(1, int(20 * scale)), batch=volume))
+
+    mc.removeEntities()
+    for e in range(500):
+        mc.spawnEntity(e % 50, 20, e // 50, 10)
+    results.append(timeCalls("getEntities 500", lambda: mc.getEntities(), max(1, int(200 * scale))))
+    results.append(timeCalls("getEntities 500 columns", lambda: mc.getEntities(columns=True), max(1, int(200 * scale))))
+    mc.removeEntities()
+
+    results.append(timeCalls("events.block.hits poll", mc.events.pollBlockHits, n))
+
+    def pollAll():
+        with mc.conn.pipeline() as pipe:
+            pipe.sendReceive(b"events.block.hits")
+            pipe.sendReceive(b"events.chat.posts")
+            pipe.sendReceive(b"events.projectile.hits")
+    results.append(timeCalls("events poll all channels pipelined", pollAll, n))
+
+    results.append(timeCalls("player.getPos", mc.player.getPos, n))
+    return results
+
+def microBenchmarks(scale):
+    """Client side benchmarks which need no server"""
+    results = []
+    n = int(200000 * scale)
+    v = Vec3(1.5, 2.5, -3.5)
+    w = Vec3(4, 5, 6)
+    b = block.Block(35, 4)
+
+    results.append(timeMicro("flatten_parameters_to_bytestring ints",
+                             lambda: flatten_parameters_to_bytestring((1, 2, 3, 4)), n))
+    results.append(timeMicro("flatten_parameters_to_bytestring Vec3, Block",
+                             lambda: flatten_parameters_to_bytestring((v, b)), n))
+    results.append(timeMicro("flatten_parameters_to_bytestring mixed",
+                             lambda: flatten_parameters_to_bytestring((1, 2.5, "a", [3, (4, 5)])), n))
+    results.append(timeMicro("intFloor floats", lambda: intFloor(1.5, 2.5, -3.5), n))
+    results.append(timeMicro("intFloor Vec3, ints", lambda: intFloor(v, 7, 1), n))
+    results.append(timeMicro("Vec3 add", lambda: v + w, n))
+    results.append(timeMicro("Vec3 mul", lambda: v * 2, n))
+    results.append(timeMicro("Vec3 length", v.length, n))
+
+    entities = "|".join("%d,10,ARROW,%d.5,70.0,%d.25" % (i, i, -i) for i in range(1000))
+    results.append(timeMicro("parseEntities 1000", lambda: parseEntities(entities), max(20, n // 1000)))
+    hits = "|".join("%d,64,%d,1,%d" % (i, -i, i % 4) for i in range(1000))
+    results.append(timeMicro("parseBlockHits 1000", lambda: parseBlockHits(hits), max(20, n // 1000)))
+    return results
+
+def freePort():
+    s = socket.socket()
+    s.bind(("localhost", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def startMockServer(latency):
+    """Start mcpi.mockserver in a subprocess => (process, port)"""
+    port = freePort()
+    env = dict(os.environ)
+    env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+    process = subprocess.Popen([sys.executable, "-m", "mcpi.mockserver", "--port", str(port),
+                                "--latency", str(latency)],
+                               env=env, stdout=subprocess.DEVNULL)
+    deadline = time.time() + 10
+    while True:
+        try:
+            socket.create_connection(("localhost", port), timeout=1).close()
+            return process, port
+        except socket.error:
+            if time.time() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError("The mock server did not start")
+            time.sleep(0.05)
+
+def mcpiVersion():
+    """The version in setup.py of the checkout being benchmarked"""
+    try:
+        with open(os.path.join(root, "setup.py")) as f:
+            match = re.search(r"""__version__\s*=\s*['"]([^'"]+)['"]""", f.read())
+        return match.group(1) if match else None
+    except IOError:
+        return None
+
+def gitRevision():
+    """git describe of the checkout being benchmarked, if it is a git checkout"""
+    try:
+        output = subprocess.check_output(["git", "describe", "--always", "--dirty"],
+                                         cwd=root, stderr=subprocess.DEVNULL)
+        return output.decode("ascii").strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline, tolerance):
+    """Print throughput changes against a baseline => names which regressed"""
+    before = dict((r["name"], r) for r in baseline["results"])
+    regressed = []
+    for r in results:
+        old = before.get(r["name"])
+        if old is None or not old["opsPerSecond"]:
+            continue
+        change = r["opsPerSecond"] / old["opsPerSecond"] - 1
+        flag = ""
+        if change < -tolerance:
+            regressed.append(r["name"])
+            flag = "  REGRESSION"
+        print("%-48s %+7.1f%%%s" % (r["name"], change * 100, flag))
+    return regressed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mcpi client")
+    parser.add_argument("--address", help="benchmark against this server instead of a mock server")
+    parser.add_argument("--port", type=int, default=4711)
+    parser.add_argument("--latency", type=float, default=0.0, help="latency of the mock server in seconds")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply the number of operations")
+    parser.add_argument("--skip-protocol", action="store_true", help="only run the microbenchmarks")
+    parser.add_argument("--destructive", action="store_true",
+                        help="allow the protocol benchmarks to change the world of the server given with --address")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare with the results in this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="throughput drop counted as a regression (default 0.10)")
+    options = parser.parse_args(argv)
+    if options.address is not None and not options.skip_protocol and not options.destructive:
+        parser.error("the protocol benchmarks overwrite blocks and remove every entity in the world, "
+                     "pass --destructive to run them against %s" % options.address)
+
+    results = microBenchmarks(options.scale)
+    server = None
+    if not options.skip_protocol:
+        address, port = options.address, options.port
+        if address is None:
+            server, port = startMockServer(options.latency)
+            address = "localhost"
+        try:
+            mc = Minecraft.create(address, port)
+            results += protocolBenchmarks(mc, options.scale)
+            mc.conn.close()
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    print("%-48s %14s %10s %10s" % ("benchmark", "ops/s", "p50 us", "p99 us"))
+    for r in results:
+        print("%-48s %14.0f %10.2f %10.2f" % (r["name"], r["opsPerSecond"], r["p50us"], r["p99us"]))
+
+    report = {
+        "mcpi": mcpiVersion(),
+        "revision": gitRevision(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "server": "mock" if options.address is None else "%s:%d" % (options.address, options.port),
+        "latency": options.latency,
+        "scale": options.scale,
+        "results": results,
+    }
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if options.compare:
+        with open(options.compare) as f:
+            regressed = compare(results, json.load(f), options.tolerance)
+        if regressed:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import asyncio
+from collections import deque
+from .connection import Connection, RequestError, _decode, _encodeCommand
+
+""" asyncio connection to a Minecraft Pi game or RaspberryJuice server
+
+    Requires Python 3.5+"""
+
+class AsyncConnection:
+    """asyncio connection to a Minecraft Pi game
+
+    Requests are written as soon as they are made and replies are matched to
+    them in FIFO order by a reader task, so many coroutines can have
+    requests in flight on the same connection at once."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.lastSent = b""
+        self._pending = deque()
+        self._readerTask = asyncio.ensure_future(self._readReplies())
+
+    @classmethod
+    async def open(cls, address="localhost", port=4711):
+        """Connect to a game => AsyncConnection"""
+        reader, writer = await asyncio.open_connection(address, port)
+        return cls(reader, writer)
+
+    async def send(self, f, *data):
+        """Sends data. Note that a trailing newline '\\n' is added here"""
+        self._write(_encodeCommand(f, data))
+        await self.writer.drain()
+
+    def _write(self, s):
+        if self._readerTask.done():
+            raise ConnectionError("Connection closed")
+        self.lastSent = s
+        self.writer.write(s)
+
+    async def sendReceiveBytes(self, f, *data):
+        """Sends and receive data as bytes"""
+        s = _encodeCommand(f, data)
+        reply = asyncio.get_event_loop().create_future()
+        self._write(s)
+        self._pending.append((reply, s))
+        return await reply
+
+    async def sendReceive(self, f, *data):
+        """Sends and receive data"""
+        return _decode(await self.sendReceiveBytes(f, *data))
+
+    async def _readReplies(self):
+        error = ConnectionError("Connection closed by the server")
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                reply, request = self._pending.popleft()
+                if reply.cancelled():
+                    continue
+                line = line.rstrip(b"\n")
+                if line == Connection.RequestFailedBytes:
+                    reply.set_exception(RequestError("%s failed"%request.strip()))
+                else:
+                    reply.set_result(line)
+        except IndexError:
+            error = ConnectionError("Received a reply with no request waiting")
+        except Exception as e:
+            error = e
+        finally:
+            while self._pending:
+                reply, _ = self._pending.popleft()
+                if not reply.done():
+                    reply.set_exception(error)
+
+    async def close(self):
+        """Closes the connection, failing any requests still waiting"""
+        self.writer.close()
+        self._readerTask.cancel()
+        try:
+            await self._readerTask
+        except asyncio.CancelledError:
+            pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
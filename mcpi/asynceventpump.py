@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from .eventpump import _Handlers, _commands
+
+""" asyncio version of mcpi.eventpump, for use with AsyncMinecraft.
+
+        pump = AsyncEventPump(await AsyncMinecraft.create(), interval=0.05)
+        pump.onChatPost(lambda e: print(e.message))
+        pump.start()
+        ...
+        await pump.stop()
+
+    As with EventPump, if polling or a handler run by the dispatch task
+    raises, the pump stops and keeps the exception in error, which
+    dispatch() raises once the queue is empty.
+
+    Python 3.5+ only, which is why it is kept out of mcpi.eventpump."""
+
+log = logging.getLogger(__name__)
+
+# asyncio.current_task is Python 3.7+
+_currentTask = getattr(asyncio, "current_task", None) or asyncio.Task.current_task
+
+class AsyncEventPump(_Handlers):
+    """Polls events of an AsyncMinecraft from an asyncio task
+
+    Handlers may be plain functions or coroutine functions."""
+    def __init__(self, mc, interval=0.1, maxQueue=1000, block=False,
+                 channels=("block", "chat", "projectile")):
+        _Handlers.__init__(self, channels)
+        self.mc = mc
+        self.interval = interval
+        self.block = block
+        self.queue = asyncio.Queue(maxQueue)
+        self.error = None
+        self._tasks = []
+
+    async def poll(self):
+        """Poll every channel at once and queue the events => count queued"""
+        conn = self.mc.conn
+        replies = await asyncio.gather(*[conn.sendReceive(_commands[c][0]) for c in self.channels])
+        self.polls += 1
+        queued = 0
+        for channel, reply in zip(self.channels, replies):
+            for event in _commands[channel][1](reply):
+                self.received += 1
+                if self.block:
+                    await self.queue.put(event)
+                    queued += 1
+                else:
+                    try:
+                        self.queue.put_nowait(event)
+                        queued += 1
+                    except asyncio.QueueFull:
+                        self.dropped += 1
+        return queued
+
+    async def dispatch(self, maxEvents=None):
+        """Call the handlers for queued events => count dispatched
+
+        Raises the error which stopped the tasks once the queue is empty."""
+        count = 0
+        if self.error is not None and self.queue.empty():
+            raise self.error
+        while (maxEvents is None or count < maxEvents) and not self.queue.empty():
+            event = self.queue.get_nowait()
+            for handler in self.handlers[type(event)]:
+                result = handler(event)
+                if asyncio.iscoroutine(result):
+                    await result
+            count += 1
+        return count
+
+    def _failed(self, error):
+        """Stop the pump, keeping the first error"""
+        if self.error is None:
+            self.error = error
+            log.error("Event pump stopped", exc_info=error)
+        current = _currentTask()
+        for t in self._tasks:
+            if t is not current:
+                t.cancel()
+
+    async def _pollLoop(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            start = loop.time()
+            try:
+                await self.poll()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed(e)
+                return
+            await asyncio.sleep(max(0, self.interval - (loop.time() - start)))
+
+    async def _dispatchLoop(self):
+        while True:
+            event = await self.queue.get()
+            try:
+                for handler in self.handlers[type(event)]:
+                    result = handler(event)
+                    if asyncio.iscoroutine(result):
+                        await result
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._failed(e)
+                return
+
+    @property
+    def running(self):
+        """Whether the tasks are still going"""
+        return any(not t.done() for t in self._tasks)
+
+    def start(self, dispatch=True):
+        """Start polling in a task, and dispatching in another if dispatch is True"""
+        self.error = None
+        coros = [self._pollLoop()] + ([self._dispatchLoop()] if dispatch else [])
+        self._tasks = [asyncio.ensure_future(c) for c in coros]
+        return self
+
+    async def stop(self):
+        """Cancel the polling and dispatching tasks"""
+        for t in self._tasks:
+            t.cancel()
+        for t in self._tasks:
+            try:
+                await t
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
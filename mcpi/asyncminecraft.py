@@ -0,0 +1,294 @@
+from .asyncconnection import AsyncConnection
+from .vec3 import Vec3
+from .entity import Entity
+from .block import Block
+from .minecraft import intFloor
+from .util import flatten
+from .parse import parseEntities, parseEntityColumns, parseBlockHits, parseChatPosts, parseProjectileHits
+
+""" asyncio version of the Minecraft PI api
+
+    Mirrors mcpi.minecraft, every method is a coroutine:
+
+        mc = await AsyncMinecraft.create()
+        pos = await mc.player.getTilePos()
+        await mc.setBlock(pos.x, pos.y - 1, pos.z, 1)
+
+    Requires Python 3.5+"""
+
+class AsyncCmdPositioner:
+    """Methods for setting and getting positions"""
+    def __init__(self, connection, packagePrefix):
+        self.conn = connection
+        self.pkg = packagePrefix
+
+    async def getPos(self, id):
+        """Get entity position (entityId:int) => Vec3"""
+        s = await self.conn.sendReceiveBytes(self.pkg + b".getPos", id)
+        return Vec3(*list(map(float, s.split(b","))))
+
+    async def setPos(self, id, *args):
+        """Set entity position (entityId:int, x,y,z)"""
+        await self.conn.send(self.pkg + b".setPos", id, args)
+
+    async def getTilePos(self, id):
+        """Get entity tile position (entityId:int) => Vec3"""
+        s = await self.conn.sendReceiveBytes(self.pkg + b".getTile", id)
+        return Vec3(*list(map(int, s.split(b","))))
+
+    async def setTilePos(self, id, *args):
+        """Set entity tile position (entityId:int) => Vec3"""
+        await self.conn.send(self.pkg + b".setTile", id, intFloor(*args))
+
+    async def setDirection(self, id, *args):
+        """Set entity direction (entityId:int, x,y,z)"""
+        await self.conn.send(self.pkg + b".setDirection", id, args)
+
+    async def getDirection(self, id):
+        """Get entity direction (entityId:int) => Vec3"""
+        s = await self.conn.sendReceiveBytes(self.pkg + b".getDirection", id)
+        return Vec3(*map(float, s.split(b",")))
+
+    async def setRotation(self, id, yaw):
+        """Set entity rotation (entityId:int, yaw)"""
+        await self.conn.send(self.pkg + b".setRotation", id, yaw)
+
+    async def getRotation(self, id):
+        """get entity rotation (entityId:int) => float"""
+        return float(await self.conn.sendReceiveBytes(self.pkg + b".getRotation", id))
+
+    async def setPitch(self, id, pitch):
+        """Set entity pitch (entityId:int, pitch)"""
+        await self.conn.send(self.pkg + b".setPitch", id, pitch)
+
+    async def getPitch(self, id):
+        """get entity pitch (entityId:int) => float"""
+        return float(await self.conn.sendReceiveBytes(self.pkg + b".getPitch", id))
+
+    async def setting(self, setting, status):
+        """Set a player setting (setting, status). keys: autojump"""
+        await self.conn.send(self.pkg + b".setting", setting, 1 if bool(status) else 0)
+
+class AsyncCmdEntity(AsyncCmdPositioner):
+    """Methods for entities"""
+    def __init__(self, connection):
+        AsyncCmdPositioner.__init__(self, connection, b"entity")
+
+    async def getName(self, id):
+        """Get the list name of the player with entity id => [name:str]"""
+        return await self.conn.sendReceive(b"entity.getName", id)
+
+    async def getEntities(self, id, distance=10, typeId=-1, columns=False):
+        """Return a list of entities near entity (playerEntityId:int, distanceFromPlayerInBlocks:int, typeId:int) => [EntityInfo]"""
+        s = await self.conn.sendReceive(b"entity.getEntities", id, distance, typeId)
+        return parseEntityColumns(s) if columns else parseEntities(s)
+
+    async def removeEntities(self, id, distance=10, typeId=-1):
+        """Remove entities all entities near entity (playerEntityId:int, distanceFromPlayerInBlocks:int, typeId:int, ) => (removedEntitiesCount:int)"""
+        return int(await self.conn.sendReceiveBytes(b"entity.removeEntities", id, distance, typeId))
+
+    async def pollBlockHits(self, *args):
+        """Only triggered by sword => [BlockEvent]"""
+        return parseBlockHits(await self.conn.sendReceive(b"entity.events.block.hits", intFloor(args)))
+
+    async def pollChatPosts(self, *args):
+        """Triggered by posts to chat => [ChatEvent]"""
+        return parseChatPosts(await self.conn.sendReceive(b"entity.events.chat.posts", intFloor(args)))
+
+    async def pollProjectileHits(self, *args):
+        """Only triggered by projectiles => [BlockEvent]"""
+        return parseProjectileHits(await self.conn.sendReceive(b"entity.events.projectile.hits", intFloor(args)))
+
+    async def clearEvents(self, *args):
+        """Clear the entities events"""
+        await self.conn.send(b"entity.events.clear", intFloor(args))
+
+class AsyncCmdPlayer(AsyncCmdPositioner):
+    """Methods for the host (Raspberry Pi) player"""
+    def __init__(self, connection):
+        AsyncCmdPositioner.__init__(self, connection, b"player")
+
+    def getPos(self):
+        return AsyncCmdPositioner.getPos(self, [])
+    def setPos(self, *args):
+        return AsyncCmdPositioner.setPos(self, [], args)
+    def getTilePos(self):
+        return AsyncCmdPositioner.getTilePos(self, [])
+    def setTilePos(self, *args):
+        return AsyncCmdPositioner.setTilePos(self, [], args)
+    def setDirection(self, *args):
+        return AsyncCmdPositioner.setDirection(self, [], args)
+    def getDirection(self):
+        return AsyncCmdPositioner.getDirection(self, [])
+    def setRotation(self, yaw):
+        return AsyncCmdPositioner.setRotation(self, [], yaw)
+    def getRotation(self):
+        return AsyncCmdPositioner.getRotation(self, [])
+    def setPitch(self, pitch):
+        return AsyncCmdPositioner.setPitch(self, [], pitch)
+    def getPitch(self):
+        return AsyncCmdPositioner.getPitch(self, [])
+
+    async def getEntities(self, distance=10, typeId=-1, columns=False):
+        """Return a list of entities near entity (distanceFromPlayerInBlocks:int, typeId:int) => [EntityInfo]"""
+        s = await self.conn.sendReceive(b"player.getEntities", distance, typeId)
+        return parseEntityColumns(s) if columns else parseEntities(s)
+
+    async def removeEntities(self, distance=10, typeId=-1):
+        """Remove entities all entities near entity (distanceFromPlayerInBlocks:int, typeId:int, ) => (removedEntitiesCount:int)"""
+        return int(await self.conn.sendReceiveBytes(b"player.removeEntities", distance, typeId))
+
+    async def pollBlockHits(self):
+        """Only triggered by sword => [BlockEvent]"""
+        return parseBlockHits(await self.conn.sendReceive(b"player.events.block.hits"))
+
+    async def pollChatPosts(self):
+        """Triggered by posts to chat => [ChatEvent]"""
+        return parseChatPosts(await self.conn.sendReceive(b"player.events.chat.posts"))
+
+    async def pollProjectileHits(self):
+        """Only triggered by projectiles => [BlockEvent]"""
+        return parseProjectileHits(await self.conn.sendReceive(b"player.events.projectile.hits"))
+
+    async def clearEvents(self):
+        """Clear the players events"""
+        await self.conn.send(b"player.events.clear")
+
+class AsyncCmdCamera:
+    def __init__(self, connection):
+        self.conn = connection
+
+    async def setNormal(self, *args):
+        """Set camera mode to normal Minecraft view ([entityId])"""
+        await self.conn.send(b"camera.mode.setNormal", args)
+
+    async def setFixed(self):
+        """Set camera mode to fixed view"""
+        await self.conn.send(b"camera.mode.setFixed")
+
+    async def setFollow(self, *args):
+        """Set camera mode to follow an entity ([entityId])"""
+        await self.conn.send(b"camera.mode.setFollow", args)
+
+    async def setPos(self, *args):
+        """Set camera entity position (x,y,z)"""
+        await self.conn.send(b"camera.setPos", args)
+
+class AsyncCmdEvents:
+    """Events"""
+    def __init__(self, connection):
+        self.conn = connection
+
+    async def clearAll(self):
+        """Clear all old events"""
+        await self.conn.send(b"events.clear")
+
+    async def pollBlockHits(self):
+        """Only triggered by sword => [BlockEvent]"""
+        return parseBlockHits(await self.conn.sendReceive(b"events.block.hits"))
+
+    async def pollChatPosts(self):
+        """Triggered by posts to chat => [ChatEvent]"""
+        return parseChatPosts(await self.conn.sendReceive(b"events.chat.posts"))
+
+    async def pollProjectileHits(self):
+        """Only triggered by projectiles => [BlockEvent]"""
+        return parseProjectileHits(await self.conn.sendReceive(b"events.projectile.hits"))
+
+class AsyncMinecraft:
+    """The main class to interact with a running instance of Minecraft Pi from asyncio."""
+    def __init__(self, connection):
+        self.conn = connection
+
+        self.camera = AsyncCmdCamera(connection)
+        self.entity = AsyncCmdEntity(connection)
+        self.player = AsyncCmdPlayer(connection)
+        self.events = AsyncCmdEvents(connection)
+
+    async def getBlock(self, *args):
+        """Get block (x,y,z) => id:int"""
+        return int(await self.conn.sendReceiveBytes(b"world.getBlock", intFloor(args)))
+
+    async def getBlockWithData(self, *args):
+        """Get block with data (x,y,z) => Block"""
+        ans = await self.conn.sendReceiveBytes(b"world.getBlockWithData", intFloor(args))
+        return Block(*list(map(int, ans.split(b","))))
+
+    async def getBlocks(self, *args):
+        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) => [id:int]"""
+        s = await self.conn.sendReceiveBytes(b"world.getBlocks", intFloor(args))
+        return map(int, s.split(b","))
+
+    async def setBlock(self, *args):
+        """Set block (x,y,z,id,[data])"""
+        await self.conn.send(b"world.setBlock", intFloor(args))
+
+    async def setBlocks(self, *args):
+        """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data])"""
+        await self.conn.send(b"world.setBlocks", intFloor(args))
+
+    async def setSign(self, *args):
+        """Set a sign (x,y,z,id,data,[line1,line2,line3,line4])"""
+        flatargs = list(flatten(args))
+        lines = [flatarg.replace(",",";").replace(")","]").replace("(","[") for flatarg in flatargs[5:]]
+        await self.conn.send(b"world.setSign", intFloor(flatargs[0:5]) + lines)
+
+    async def spawnEntity(self, *args):
+        """Spawn entity (x,y,z,id)"""
+        return int(await self.conn.sendReceiveBytes(b"world.spawnEntity", args))
+
+    async def getHeight(self, *args):
+        """Get the height of the world (x,z) => int"""
+        return int(await self.conn.sendReceiveBytes(b"world.getHeight", intFloor(args)))
+
+    async def getPlayerEntityIds(self):
+        """Get the entity ids of the connected players => [id:int]"""
+        ids = await self.conn.sendReceiveBytes(b"world.getPlayerIds")
+        return list(map(int, ids.split(b"|")))
+
+    async def getPlayerEntityId(self, name):
+        """Get the entity id of the named player => [id:int]"""
+        return int(await self.conn.sendReceiveBytes(b"world.getPlayerId", name))
+
+    async def saveCheckpoint(self):
+        """Save a checkpoint that can be used for restoring the world"""
+        await self.conn.send(b"world.checkpoint.save")
+
+    async def restoreCheckpoint(self):
+        """Restore the world state to the checkpoint"""
+        await self.conn.send(b"world.checkpoint.restore")
+
+    async def postToChat(self, msg):
+        """Post a message to the game chat"""
+        await self.conn.send(b"chat.post", msg)
+
+    async def setting(self, setting, status):
+        """Set a world setting (setting, status). keys: world_immutable, nametags_visible"""
+        await self.conn.send(b"world.setting", setting, 1 if bool(status) else 0)
+
+    async def getEntityTypes(self):
+        """Return a list of Entity objects representing all the entity types in Minecraft"""
+        s = await self.conn.sendReceive(b"world.getEntityTypes")
+        types = [t for t in s.split("|") if t]
+        return [Entity(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in types]
+
+    async def getEntities(self, typeId=-1, columns=False):
+        """Return a list of all currently loaded entities (EntityType:int) => [EntityInfo]"""
+        s = await self.conn.sendReceive(b"world.getEntities", typeId)
+        return parseEntityColumns(s) if columns else parseEntities(s)
+
+    async def removeEntity(self, id):
+        """Remove entity by id (entityId:int) => (removedEntitiesCount:int)"""
+        return int(await self.conn.sendReceiveBytes(b"world.removeEntity", int(id)))
+
+    async def removeEntities(self, typeId=-1):
+        """Remove entities all currently loaded Entities by type (typeId:int) => (removedEntitiesCount:int)"""
+        return int(await self.conn.sendReceiveBytes(b"world.removeEntities", typeId))
+
+    async def close(self):
+        """Close the connection to the game"""
+        await self.conn.close()
+
+    @staticmethod
+    async def create(address = "localhost", port = 4711):
+        return AsyncMinecraft(await AsyncConnection.open(address, port))
@@ -0,0 +1,268 @@
+import time
+from array import array
+from collections import OrderedDict
+from .block import Block
+from .minecraft import Minecraft, CmdEvents, CmdPlayer, intFloor
+from .connection import Connection
+from .heightmap import heightAfter
+
+""" An opt-in client side cache of the world, for bots which read the same
+    blocks and heights over and over.
+
+        mc = CachedMinecraft.create()
+        mc.getBlock(10, 64, 10)    # fetches the whole 16x16x16 section
+        mc.getBlock(11, 64, 10)    # answered from the cache
+
+    Blocks are cached a 16x16x16 section at a time, filled with one
+    world.getBlocks request on a miss, and evicted least recently used first
+    once the memory cap is reached. Writes made through the CachedMinecraft
+    update the cache, block hit events polled through it invalidate the
+    blocks that were hit, and entries older than ttl seconds are refetched.
+    Changes made by anything else (players, other connections) are only
+    seen once the entry is invalidated or expires."""
+
+SectionBits = 4
+SectionSize = 1 << SectionBits
+SectionCells = SectionSize ** 3
+# ids as array('H'), a byte of data per block and a bit saying it is known
+SectionBytes = 2 * SectionCells + SectionCells + SectionCells // 8
+
+class _Section:
+    __slots__ = ("blocks", "data", "known", "time")
+
+    def __init__(self, blocks, now):
+        self.blocks = blocks
+        # data values are only known for blocks read with getBlockWithData
+        # or written through the cache
+        self.data = bytearray(SectionCells)
+        self.known = bytearray(SectionCells // 8)
+        self.time = now
+
+    def hasData(self, i):
+        return self.known[i >> 3] >> (i & 7) & 1
+
+    def setData(self, i, data, count=1):
+        """Set the data of count blocks from index i"""
+        self.data[i:i + count] = bytearray([data]) * count
+        known = self.known
+        for j in range(i, i + count):
+            known[j >> 3] |= 1 << (j & 7)
+
+def _index(x, y, z):
+    m = SectionSize - 1
+    return ((y & m) * SectionSize + (x & m)) * SectionSize + (z & m)
+
+class WorldCache:
+    """Chunk keyed cache of block ids, block data and column heights"""
+    def __init__(self, maxBytes=16 << 20, ttl=None, maxColumns=65536):
+        self.maxSections = max(1, maxBytes // SectionBytes)
+        self.maxColumns = maxColumns
+        self.ttl = ttl
+        self.sections = OrderedDict()
+        self.columns = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, t):
+        return self.ttl is not None and time.time() - t > self.ttl
+
+    def section(self, x, y, z):
+        """The cached section holding (x,y,z), or None"""
+        key = (x >> SectionBits, y >> SectionBits, z >> SectionBits)
+        section = self.sections.get(key)
+        if section is None:
+            return None
+        if self._expired(section.time):
+            del self.sections[key]
+            return None
+        self.sections.move_to_end(key)
+        return section
+
+    def addSection(self, x, y, z, blocks):
+        """Cache the blocks of the section holding (x,y,z)"""
+        key = (x >> SectionBits, y >> SectionBits, z >> SectionBits)
+        section = _Section(blocks, time.time())
+        self.sections[key] = section
+        while len(self.sections) > self.maxSections:
+            self.sections.popitem(last=False)
+        return section
+
+    def height(self, x, z):
+        """The cached height of column (x,z), or None"""
+        entry = self.columns.get((x, z))
+        if entry is None:
+            return None
+        if self._expired(entry[1]):
+            del self.columns[(x, z)]
+            return None
+        self.columns.move_to_end((x, z))
+        return entry[0]
+
+    def addHeight(self, x, z, height):
+        """Cache the height of column (x,z)"""
+        self.columns[(x, z)] = (height, time.time())
+        while len(self.columns) > self.maxColumns:
+            self.columns.popitem(last=False)
+
+    def setBlock(self, x, y, z, id, data=0):
+        """Apply a write of a single block to the cache"""
+        section = self.section(x, y, z)
+        if section is not None:
+            i = _index(x, y, z)
+            section.blocks[i] = id
+            section.setData(i, data)
+        self._updateHeight(x, z, y, y, id)
+
+    def _updateHeight(self, x, z, y0, y1, id):
+        h = self.columns.get((x, z))
+        if h is None:
+            return
+        height = heightAfter(h[0], y0, y1, id)
+        if height is None:
+            del self.columns[(x, z)]
+        elif height != h[0]:
+            self.columns[(x, z)] = (height, h[1])
+
+    def setBlocks(self, x0, y0, z0, x1, y1, z1, id, data=0):
+        """Apply a write of a cuboid of blocks to the cache"""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        kx0, ky0, kz0 = x0 >> SectionBits, y0 >> SectionBits, z0 >> SectionBits
+        kx1, ky1, kz1 = x1 >> SectionBits, y1 >> SectionBits, z1 >> SectionBits
+        if (kx1 - kx0 + 1) * (ky1 - ky0 + 1) * (kz1 - kz0 + 1) <= len(self.sections):
+            keys = [(kx, ky, kz) for kx in range(kx0, kx1 + 1) for ky in range(ky0, ky1 + 1)
+                    for kz in range(kz0, kz1 + 1) if (kx, ky, kz) in self.sections]
+        else:
+            # a cuboid spanning more sections than are cached
+            keys = [k for k in self.sections
+                    if kx0 <= k[0] <= kx1 and ky0 <= k[1] <= ky1 and kz0 <= k[2] <= kz1]
+        for key in keys:
+            sx, sy, sz = [k << SectionBits for k in key]
+            ax, bx = max(x0, sx), min(x1, sx + SectionSize - 1)
+            ay, by = max(y0, sy), min(y1, sy + SectionSize - 1)
+            az, bz = max(z0, sz), min(z1, sz + SectionSize - 1)
+            section = self.sections[key]
+            w = bz - az + 1
+            ids = array(section.blocks.typecode, [id] * w)
+            for y in range(ay, by + 1):
+                for x in range(ax, bx + 1):
+                    i = _index(x, y, az)
+                    section.blocks[i:i + w] = ids
+                    section.setData(i, data, w)
+        if (x1 - x0 + 1) * (z1 - z0 + 1) <= len(self.columns):
+            columns = [(x, z) for x in range(x0, x1 + 1) for z in range(z0, z1 + 1)
+                       if (x, z) in self.columns]
+        else:
+            columns = [(x, z) for x, z in self.columns if x0 <= x <= x1 and z0 <= z <= z1]
+        for x, z in columns:
+            self._updateHeight(x, z, y0, y1, id)
+
+    def invalidate(self, x, y, z):
+        """Forget everything cached about block (x,y,z)"""
+        self.sections.pop((x >> SectionBits, y >> SectionBits, z >> SectionBits), None)
+        self.columns.pop((x, z), None)
+
+    def clear(self):
+        """Forget everything"""
+        self.sections.clear()
+        self.columns.clear()
+
+class _CachedEvents(CmdEvents):
+    """CmdEvents which invalidates blocks that are hit"""
+    def __init__(self, connection, cache):
+        CmdEvents.__init__(self, connection)
+        self.cache = cache
+
+    def pollBlockHits(self):
+        events = CmdEvents.pollBlockHits(self)
+        for e in events:
+            self.cache.invalidate(e.pos.x, e.pos.y, e.pos.z)
+        return events
+
+class _CachedPlayer(CmdPlayer):
+    """CmdPlayer which invalidates blocks that are hit"""
+    def __init__(self, connection, cache):
+        CmdPlayer.__init__(self, connection)
+        self.cache = cache
+
+    def pollBlockHits(self):
+        events = CmdPlayer.pollBlockHits(self)
+        for e in events:
+            self.cache.invalidate(e.pos.x, e.pos.y, e.pos.z)
+        return events
+
+class CachedMinecraft(Minecraft):
+    """Minecraft with getBlock, getBlockWithData and getHeight answered
+    from a WorldCache where possible"""
+    def __init__(self, connection, cache=None):
+        Minecraft.__init__(self, connection)
+        self.cache = WorldCache() if cache is None else cache
+        self.events = _CachedEvents(connection, self.cache)
+        self.player = _CachedPlayer(connection, self.cache)
+
+    def _section(self, x, y, z):
+        section = self.cache.section(x, y, z)
+        if section is None:
+            self.cache.misses += 1
+            m = ~(SectionSize - 1)
+            x0, y0, z0 = x & m, y & m, z & m
+            region = Minecraft.getBlocksArray(self,
+                x0, y0, z0, x0 + SectionSize - 1, y0 + SectionSize - 1, z0 + SectionSize - 1)
+            section = self.cache.addSection(x, y, z, region.blocks)
+        else:
+            self.cache.hits += 1
+        return section
+
+    def getBlock(self, *args):
+        """Get block (x,y,z) => id:int"""
+        x, y, z = intFloor(args)
+        return self._section(x, y, z).blocks[_index(x, y, z)]
+
+    def getBlockWithData(self, *args):
+        """Get block with data (x,y,z) => Block"""
+        x, y, z = intFloor(args)
+        section = self.cache.section(x, y, z)
+        i = _index(x, y, z)
+        if section is not None and section.hasData(i):
+            self.cache.hits += 1
+            return Block(section.blocks[i], section.data[i])
+        self.cache.misses += 1
+        block = Minecraft.getBlockWithData(self, x, y, z)
+        if section is not None:
+            section.blocks[i] = block.id
+            section.setData(i, block.data)
+        return block
+
+    def getHeight(self, *args):
+        """Get the height of the world (x,z) => int"""
+        x, z = intFloor(args)
+        height = self.cache.height(x, z)
+        if height is None:
+            self.cache.misses += 1
+            height = Minecraft.getHeight(self, x, z)
+            self.cache.addHeight(x, z, height)
+        else:
+            self.cache.hits += 1
+        return height
+
+    def setBlock(self, *args):
+        """Set block (x,y,z,id,[data])"""
+        args = intFloor(args)
+        Minecraft.setBlock(self, args)
+        self.cache.setBlock(*args[:5])
+
+    def setBlocks(self, *args):
+        """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data])"""
+        args = intFloor(args)
+        Minecraft.setBlocks(self, args)
+        self.cache.setBlocks(*args[:8])
+
+    def restoreCheckpoint(self):
+        """Restore the world state to the checkpoint"""
+        Minecraft.restoreCheckpoint(self)
+        self.cache.clear()
+
+    @staticmethod
+    def create(address = "localhost", port = 4711, cache = None, **kwargs):
+        return CachedMinecraft(Connection(address, port, **kwargs), cache)
@@ -1,32 +1,114 @@
+import logging
 import socket
 import select
-import sys
+import threading
+import time
+from collections import deque
+from .metrics import clock
 from .util import flatten_parameters_to_bytestring
 
 """ @author: Aron Nieminen, Mojang AB"""
 
+log = logging.getLogger(__name__)
+
 class RequestError(Exception):
     pass
 
+def _decode(b):
+    """Decodes a reply from the bytes read off the socket"""
+    return b.decode("UTF-8", "replace")
+
+_prefixes = {}
+
+def _encodeCommand(f, data):
+    """Encodes a command and its parameters as a protocol line"""
+    prefix = _prefixes.get(f)
+    if prefix is None:
+        prefix = _prefixes[f] = f + b"("
+    return prefix + flatten_parameters_to_bytestring(data) + b")\n"
+
 class Connection:
-    """Connection to a Minecraft Pi game"""
+    """Connection to a Minecraft Pi game
+
+    By default the socket is only checked for stray data before a request
+    which expects a reply, and optionally every drainInterval seconds.
+    strict=True checks before every command is sent, which costs a select()
+    per command but pins stray data on the command that caused it.
+    Stray data is logged as a warning on the "mcpi.connection" logger.
+
+    Commands can be gathered in a send buffer and written in large batches,
+    either by passing bufferSize or inside a "with connection:" block. The
+    buffer is written when it reaches bufferSize bytes, flushInterval
+    seconds after the oldest buffered command was sent (by a timer thread,
+    so commands buffered just before the program goes idle are still
+    written), before any reply is read, on flush() and when the with block
+    or connection is closed. The buffer is guarded by a lock so that the
+    timer can write it; a failed timed write is logged.
+
+    Pass a mcpi.metrics.Metrics as metrics to count commands, bytes and
+    stray data and to time every command. Stray data is then counted and
+    only logged at debug level."""
     RequestFailed = "Fail"
+    RequestFailedBytes = b"Fail"
+    RecvSize = 65536
+    DefaultBufferSize = 65536
 
-    def __init__(self, address, port):
+    def __init__(self, address, port, strict=False, drainInterval=None,
+                 bufferSize=0, flushInterval=None, metrics=None):
         self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.socket.connect((address, port))
+        self.strict = strict
+        self.drainInterval = drainInterval
+        self._nextDrain = 0
+        self.bufferSize = bufferSize
+        self.flushInterval = flushInterval
+        self._batchDepth = 0
+        self._wbuf = bytearray()
+        self._wbufTime = 0
+        self._wlock = threading.RLock()
+        self._timer = None
         self.lastSent = ""
+        self.metrics = metrics
+        self._outstanding = 0
+        # replies are read into one long lived buffer, complete lines are
+        # split off the front and anything past the last newline is kept
+        self._rbuf = bytearray()
+        self._chunk = bytearray(Connection.RecvSize)
+        self._chunkView = memoryview(self._chunk)
 
     def drain(self):
         """Drains the socket of incoming data"""
+        if self._outstanding:
+            # replies to pipelined requests are still on their way
+            return
+        if self.drainInterval is not None:
+            self._nextDrain = time.time() + self.drainInterval
+        drained = 0
         while True:
-            readable, _, _ = select.select([self.socket], [], [], 0.0)
-            if not readable:
-                break
-            data = self.socket.recv(1500)
-            e =  "Drained Data: <%s>\n"%data.strip()
-            e += "Last Message: <%s>\n"%self.lastSent.strip()
-            sys.stderr.write(e)
+            if self._rbuf:
+                data = bytes(self._rbuf)
+                del self._rbuf[:]
+            else:
+                readable, _, _ = select.select([self.socket], [], [], 0.0)
+                if not readable:
+                    break
+                data = self.socket.recv(1500)
+                if not data:
+                    break
+            drained += len(data)
+            if self.metrics is None:
+                log.warning("Drained Data: <%s> Last Message: <%s>",
+                    data.strip(), self.lastSent.strip())
+            else:
+                log.debug("Drained Data: <%s> Last Message: <%s>",
+                    data.strip(), self.lastSent.strip())
+        if self.metrics is not None:
+            self.metrics.drainChecked(drained)
+
+    def _drainBeforeReply(self):
+        """Drains stray data before a request which expects a reply"""
+        if not self.strict:
+            self.drain()
 
     def send(self, f, *data):
         """
@@ -35,28 +117,271 @@ class Connection:
         The protocol uses CP437 encoding - https://en.wikipedia.org/wiki/Code_page_437
         which is mildly distressing as it can't encode all of Unicode.
         """
+        if self.metrics is not None:
+            start = clock()
+            s = self._encode(f, data)
+            self._send(s)
+            self.metrics.record(f, len(s), 0, clock() - start)
+            return
+        self._send(self._encode(f, data))
 
-        s = b"".join([f, b"(", flatten_parameters_to_bytestring(data), b")", b"\n"])
-        self._send(s)
+    def _encode(self, f, data):
+        """Encodes a command and its parameters as a protocol line"""
+        return _encodeCommand(f, data)
 
     def _send(self, s):
         """
         The actual socket interaction from self.send, extracted for easier mocking
         and testing
         """
-        self.drain()
-        self.lastSent = s
+        if self.bufferSize or self._batchDepth:
+            with self._wlock:
+                self.lastSent = s
+                if not self._wbuf and self.flushInterval is not None:
+                    self._wbufTime = time.time()
+                    self._timer = threading.Timer(self.flushInterval, self._timedFlush)
+                    self._timer.daemon = True
+                    self._timer.start()
+                self._wbuf += s
+                if len(self._wbuf) >= (self.bufferSize or Connection.DefaultBufferSize):
+                    self.flush()
+                elif (self.flushInterval is not None and
+                      time.time() - self._wbufTime >= self.flushInterval):
+                    self.flush()
+            return
+        self._write(s)
+
+    def _timedFlush(self):
+        """Flush from the flushInterval timer thread"""
+        try:
+            self.flush()
+        except socket.error as e:
+            log.warning("Timed flush of the send buffer failed: %s", e)
+
+    def _write(self, s):
+        """Writes bytes to the socket"""
+        if self.strict:
+            self.drain()
+        elif self.drainInterval is not None and time.time() >= self._nextDrain:
+            self.drain()
+        if s is not self._wbuf:
+            self.lastSent = s
 
         self.socket.sendall(s)
 
-    def receive(self):
-        """Receives data. Note that the trailing newline '\n' is trimmed"""
-        s = self.socket.makefile("r").readline().rstrip("\n")
-        if s == Connection.RequestFailed:
+    def flush(self):
+        """Writes any buffered commands to the socket"""
+        with self._wlock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._wbuf:
+                try:
+                    self._write(self._wbuf)
+                finally:
+                    del self._wbuf[:]
+
+    def close(self):
+        """Flushes any buffered commands and closes the socket"""
+        try:
+            self.flush()
+        finally:
+            self.socket.close()
+
+    def __enter__(self):
+        """Buffers commands until the with block exits"""
+        self._batchDepth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._batchDepth -= 1
+        if not self._batchDepth:
+            self.flush()
+
+    def _readline(self):
+        """Reads the next line from the socket, without its trailing newline"""
+        if self._wbuf:
+            self.flush()
+        buf = self._rbuf
+        start = 0
+        while True:
+            end = buf.find(b"\n", start)
+            if end >= 0:
+                line = bytes(buf[:end])
+                del buf[:end + 1]
+                return line
+            start = len(buf)
+            n = self.socket.recv_into(self._chunk)
+            if not n:
+                raise socket.error("Connection closed by the server")
+            buf += self._chunkView[:n]
+
+    def receiveBytes(self):
+        """Receives data as bytes. Note that the trailing newline '\n' is trimmed"""
+        s = self._readline()
+        if s == Connection.RequestFailedBytes:
             raise RequestError("%s failed"%self.lastSent.strip())
         return s
 
+    def receive(self):
+        """Receives data. Note that the trailing newline '\n' is trimmed"""
+        return _decode(self.receiveBytes())
+
+    def sendReceiveBytes(self, *data):
+        """Sends and receive data as bytes"""
+        self._drainBeforeReply()
+        if self.metrics is not None:
+            return self._sendReceiveMeasured(data[0], data[1:])
+        self.send(*data)
+        return self.receiveBytes()
+
     def sendReceive(self, *data):
         """Sends and receive data"""
-        self.send(*data)
-        return self.receive()
+        return _decode(self.sendReceiveBytes(*data))
+
+    def _sendReceiveMeasured(self, f, data):
+        """sendReceiveBytes, recording the round trip in metrics"""
+        start = clock()
+        s = self._encode(f, data)
+        self._send(s)
+        try:
+            reply = self.receiveBytes()
+        except RequestError:
+            self.metrics.record(f, len(s), len(Connection.RequestFailedBytes) + 1, clock() - start, True)
+            raise
+        self.metrics.record(f, len(s), len(reply) + 1, clock() - start)
+        return reply
+
+    def pipeline(self):
+        """Returns a Pipeline for queueing many requests on this connection"""
+        return Pipeline(self)
+
+    def sendReceiveMany(self, commands):
+        """
+        Sends many requests in one write and receives their replies in order
+
+        commands is an iterable of (f, *data) tuples, e.g.
+        [(b"world.getHeight", 0, 0), (b"world.getHeight", 0, 1)]
+        """
+        pipe = Pipeline(self)
+        for command in commands:
+            pipe.sendReceive(*command)
+        return pipe.results()
+
+class PendingReply:
+    """The reply to a request queued on a Pipeline"""
+    def __init__(self, pipeline, request, command=None):
+        self.pipeline = pipeline
+        self.request = request
+        self.command = command
+        self._done = False
+        self._value = None
+        self._error = None
+
+    def done(self):
+        """True once the reply has been read from the connection"""
+        return self._done
+
+    def resultBytes(self):
+        """Returns the reply as bytes, sending and reading as much as needed to get it"""
+        if not self._done:
+            self.pipeline._readUntil(self)
+        if self._error is not None:
+            raise self._error
+        return self._value
+
+    def result(self):
+        """Returns the reply, sending and reading as much as needed to get it"""
+        return _decode(self.resultBytes())
+
+    def _set(self, s):
+        self._done = True
+        if s == Connection.RequestFailedBytes:
+            self._error = RequestError("%s failed"%self.request.strip())
+        else:
+            self._value = s
+
+class Pipeline:
+    """
+    Queues requests on a Connection without waiting for each reply
+
+    Queued requests are written with a single sendall when the pipeline is
+    flushed, and replies are then read back in the order the requests were
+    queued. Nothing else should use the connection until every reply has
+    been read.
+
+        with mc.conn.pipeline() as pipe:
+            heights = [pipe.sendReceive(b"world.getHeight", x, z)
+                       for x in range(256) for z in range(256)]
+        heights = [int(h.result()) for h in heights]
+    """
+    def __init__(self, connection):
+        self.conn = connection
+        self._queued = []
+        self._unsent = 0
+        self._unread = deque()
+        self._flushed = 0
+
+    def send(self, f, *data):
+        """Queues a command which has no reply"""
+        s = self.conn._encode(f, data)
+        self._queued.append(s)
+        if self.conn.metrics is not None:
+            self.conn.metrics.record(f, len(s), 0, None)
+
+    def sendReceive(self, f, *data):
+        """Queues a request => PendingReply"""
+        s = self.conn._encode(f, data)
+        self._queued.append(s)
+        self._unsent += 1
+        reply = PendingReply(self, s, f)
+        self._unread.append(reply)
+        return reply
+
+    def flush(self):
+        """Writes all queued requests to the connection in one go"""
+        if not self._queued:
+            return
+        s = b"".join(self._queued)
+        del self._queued[:]
+        if self._unsent:
+            self.conn._drainBeforeReply()
+        self.conn._send(s)
+        self.conn.flush()
+        self.conn._outstanding += self._unsent
+        self._unsent = 0
+        if self.conn.metrics is not None:
+            self._flushed = clock()
+
+    def _readUntil(self, reply):
+        self.flush()
+        metrics = self.conn.metrics
+        while self._unread:
+            r = self._unread.popleft()
+            s = self._readReply()
+            r._set(s)
+            if metrics is not None:
+                metrics.record(r.command, len(r.request), len(s) + 1,
+                               clock() - self._flushed, r._error is not None)
+            if r is reply:
+                break
+
+    def _readReply(self):
+        try:
+            return self.conn._readline()
+        finally:
+            self.conn._outstanding -= 1
+
+    def results(self):
+        """Flushes and reads every outstanding reply => [str]
+
+        A failed request raises RequestError once all replies are read."""
+        replies = list(self._unread)
+        self._readUntil(None)
+        return [r.result() for r in replies]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._readUntil(None)
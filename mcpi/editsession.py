@@ -0,0 +1,191 @@
+from .minecraft import intFloor
+from .region import parseIds
+from .voxel import mergeBoxes, sendBoxes
+
+""" Transactional world edits with undo and redo.
+
+        with EditSession(mc) as session:
+            session.setBlocks(0, 0, 0, 20, 5, 20, block.STONE)
+            session.setBlock(10, 6, 10, block.GOLD_BLOCK)
+        ...
+        session.undo()      # puts back only what the session changed
+        session.redo()
+
+    Edits are collected until commit() (or the end of the with block). The
+    blocks about to be changed are then read with batched world.getBlocks
+    requests, edits which would not change anything are dropped, and the
+    net difference is written as merged setBlocks cuboids. Only the blocks
+    which actually changed are kept in the undo log, so writing the same
+    arena twice costs nothing the second time.
+
+    world.getBlocks only returns block ids, so the data value of a block is
+    then read with a pipelined world.getBlockWithData unless its id is one
+    of DataFreeIds, whose data is always 0. Pass trackData=True to read
+    every touched block with world.getBlockWithData instead, which is
+    cheaper when most of them are e.g. wool or stairs."""
+
+TileBits = 4
+TileSize = 1 << TileBits
+MaxMergeVolume = 1 << 22
+# merge over the bounding box only while it holds at most this many cells
+# per block written, sparser edits are merged tile by tile
+SparseFactor = 64
+
+# ids whose data value is always 0, so world.getBlocks reads them exactly
+DataFreeIds = frozenset([0, 2, 4, 7, 13, 14, 15, 16, 20, 21, 22, 41, 42, 45,
+                         47, 48, 49, 56, 57, 58, 73, 79, 80, 82, 89, 102, 103, 246])
+
+def _tiles(positions):
+    """Group positions by the 16x16x16 tile they are in => {tileKey: [pos]}"""
+    tiles = {}
+    for pos in positions:
+        key = (pos[0] >> TileBits, pos[1] >> TileBits, pos[2] >> TileBits)
+        tiles.setdefault(key, []).append(pos)
+    return tiles
+
+def _readWithData(mc, positions):
+    """Read positions with pipelined world.getBlockWithData => {(x,y,z): (id, data)}"""
+    with mc.conn.pipeline() as pipe:
+        replies = [(pos, pipe.sendReceive(b"world.getBlockWithData", pos)) for pos in positions]
+    result = {}
+    for pos, reply in replies:
+        id, data = map(int, reply.resultBytes().split(b","))
+        result[pos] = (id, data)
+    return result
+
+def readBlocks(mc, positions, trackData=False):
+    """Read the blocks at many positions in pipelined batches
+    => {(x,y,z): (id, data)}
+
+    Without trackData, each 16x16x16 tile holding a position is read with
+    one world.getBlocks, then the positions whose id is not in DataFreeIds
+    are read again with world.getBlockWithData for their data."""
+    if trackData:
+        return _readWithData(mc, positions)
+    with mc.conn.pipeline() as pipe:
+        replies = []
+        for key, members in _tiles(positions).items():
+            x0, y0, z0 = [k << TileBits for k in key]
+            tile = (x0, y0, z0, x0 + TileSize - 1, y0 + TileSize - 1, z0 + TileSize - 1)
+            replies.append((members, pipe.sendReceive(b"world.getBlocks", tile)))
+    result = {}
+    unknown = []
+    m = TileSize - 1
+    for members, reply in replies:
+        ids = parseIds(reply.resultBytes())
+        for x, y, z in members:
+            id = ids[((y & m) * TileSize + (x & m)) * TileSize + (z & m)]
+            if id in DataFreeIds:
+                result[(x, y, z)] = (id, 0)
+            else:
+                unknown.append((x, y, z))
+    if unknown:
+        result.update(_readWithData(mc, unknown))
+    return result
+
+def writeBlocks(mc, blocks):
+    """Write {(x,y,z): (id, data)} as merged setBlocks cuboids => commands sent"""
+    if not blocks:
+        return 0
+    xs = [p[0] for p in blocks]
+    ys = [p[1] for p in blocks]
+    zs = [p[2] for p in blocks]
+    x0, y0, z0 = min(xs), min(ys), min(zs)
+    sy, sx, sz = max(ys) - y0 + 1, max(xs) - x0 + 1, max(zs) - z0 + 1
+    volume = sy * sx * sz
+    if volume > MaxMergeVolume or volume > SparseFactor * len(blocks):
+        # too sparse to merge over the bounding box, merge tile by tile;
+        # a single tile is at most TileSize ** 3 cells and merged as it is
+        tiles = _tiles(blocks)
+        if len(tiles) > 1:
+            return sum(writeBlocks(mc, dict((p, blocks[p]) for p in members))
+                       for members in tiles.values())
+    # cells which are not written hold -1, which mergeBoxes skips
+    ids = [-1] * (sy * sx * sz)
+    data = [0] * (sy * sx * sz)
+    for (x, y, z), (id, d) in blocks.items():
+        i = ((y - y0) * sx + (x - x0)) * sz + (z - z0)
+        ids[i] = id
+        data[i] = d
+    boxes = mergeBoxes(ids, (sy, sx, sz), data=data, skip=-1)
+    return sendBoxes(mc, (x0, y0, z0), boxes)
+
+class EditSession:
+    """Records block edits, writes only the net difference, and can undo
+    and redo its own changes"""
+    def __init__(self, mc, trackData=False):
+        self.mc = mc
+        self.trackData = trackData
+        self.pending = {}
+        self.history = []
+        self.undone = []
+        self.commandsSent = 0
+
+    def setBlock(self, *args):
+        """Set block (x,y,z,id,[data])"""
+        args = intFloor(args)
+        self.pending[tuple(args[:3])] = (args[3], args[4] if len(args) > 4 else 0)
+
+    def setBlocks(self, *args):
+        """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data])"""
+        args = intFloor(args)
+        x0, y0, z0, x1, y1, z1 = args[:6]
+        block = (args[6], args[7] if len(args) > 7 else 0)
+        pending = self.pending
+        for y in range(min(y0, y1), max(y0, y1) + 1):
+            for x in range(min(x0, x1), max(x0, x1) + 1):
+                for z in range(min(z0, z1), max(z0, z1) + 1):
+                    pending[(x, y, z)] = block
+
+    def commit(self):
+        """Write the pending edits which change something => blocks changed"""
+        if not self.pending:
+            return 0
+        before = readBlocks(self.mc, list(self.pending), self.trackData)
+        after = dict((pos, block) for pos, block in self.pending.items()
+                     if before[pos] != block)
+        self.pending = {}
+        if not after:
+            return 0
+        old = dict((pos, before[pos]) for pos in after)
+        self.commandsSent += writeBlocks(self.mc, after)
+        self.history.append((old, after))
+        del self.undone[:]
+        return len(after)
+
+    def rollback(self):
+        """Forget the pending edits"""
+        self.pending = {}
+
+    def undo(self):
+        """Put back the blocks changed by the last commit => False if there
+        was nothing to undo"""
+        if not self.history:
+            return False
+        old, new = self.history.pop()
+        self.commandsSent += writeBlocks(self.mc, old)
+        self.undone.append((old, new))
+        return True
+
+    def redo(self):
+        """Reapply the last undone commit => False if there was nothing to redo"""
+        if not self.undone:
+            return False
+        old, new = self.undone.pop()
+        self.commandsSent += writeBlocks(self.mc, new)
+        self.history.append((old, new))
+        return True
+
+    def undoAll(self):
+        """Undo every commit made by this session"""
+        while self.undo():
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
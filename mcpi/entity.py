@@ -1,3 +1,6 @@
+from collections import namedtuple
+from .vec3 import Vec3
+
 class Entity:
     '''Minecraft PI entity description. Can be sent to Minecraft.spawnEntity'''
 
@@ -21,6 +24,25 @@ class Entity:
     def __repr__(self):
         return 'Entity(%d)'%(self.id)
 
+class EntityInfo(namedtuple("EntityInfo", "id typeId typeName x y z")):
+    '''A loaded entity, as returned by getEntities
+
+    Indexes like the [entityId, entityTypeId, entityTypeName, posX, posY, posZ]
+    lists getEntities used to return.'''
+    __slots__ = ()
+
+    @property
+    def pos(self):
+        return Vec3(self.x, self.y, self.z)
+
+class EntityColumns(namedtuple("EntityColumns", "ids typeIds typeNames xs ys zs")):
+    '''Loaded entities as columns: array('l') ids and typeIds, a list of
+    typeNames and array('d') xs, ys and zs'''
+    __slots__ = ()
+
+    def __len__(self):
+        return len(self.ids)
+
 EXPERIENCE_ORB = Entity(2, "EXPERIENCE_ORB")
 AREA_EFFECT_CLOUD = Entity(3, "AREA_EFFECT_CLOUD")
 ELDER_GUARDIAN = Entity(4, "ELDER_GUARDIAN")
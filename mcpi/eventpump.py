@@ -0,0 +1,318 @@
+import logging
+import threading
+import time
+from .connection import RequestError
+from .event import BlockEvent, ChatEvent, ProjectileEvent
+from .minecraft import Minecraft
+from .parse import parseBlockHits, parseChatPosts, parseProjectileHits
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+""" Background polling of block, chat and projectile events, dispatched to
+    registered handlers.
+
+        pump = EventPump.create(interval=0.05)
+        pump.onBlockHit(lambda e: print("hit", e.pos))
+        pump.onChatPost(lambda e: print(e.message))
+        pump.start()
+        while True:
+            pump.dispatch()     # run the handlers on the game loop thread
+            ...
+
+    The three event channels are polled in one pipelined batch. Events wait
+    in a bounded queue until they are dispatched. When the queue is full the
+    pump either waits for room (block=True) or drops the event and counts it
+    in dropped.
+
+    PlayerEventPump polls each player's own event queue instead, backing
+    off from quiet players and keeping under a global request rate.
+
+    If polling or a handler run on the dispatch thread raises, the pump
+    stops and keeps the exception in error; dispatch() raises it once the
+    events queued before the failure have been dispatched.
+
+    The pump should have a connection of its own. Events are queued per
+    connection on the server, so a separate connection sees the same
+    events. See mcpi.asynceventpump for an asyncio version."""
+
+log = logging.getLogger(__name__)
+
+_commands = {
+    "block": (b"events.block.hits", parseBlockHits),
+    "chat": (b"events.chat.posts", parseChatPosts),
+    "projectile": (b"events.projectile.hits", parseProjectileHits),
+}
+
+class _Handlers:
+    """Handler registry shared by EventPump and asynceventpump.AsyncEventPump"""
+    def __init__(self, channels):
+        for channel in channels:
+            if channel not in _commands:
+                raise ValueError("Unknown event channel %s"%channel)
+        self.channels = tuple(channels)
+        self.handlers = {BlockEvent: [], ChatEvent: [], ProjectileEvent: []}
+        self.polls = 0
+        self.received = 0
+        self.dropped = 0
+
+    def on(self, eventType, handler):
+        """Call handler(event) for every event of eventType"""
+        self.handlers[eventType].append(handler)
+        return handler
+
+    def onBlockHit(self, handler):
+        return self.on(BlockEvent, handler)
+
+    def onChatPost(self, handler):
+        return self.on(ChatEvent, handler)
+
+    def onProjectileHit(self, handler):
+        return self.on(ProjectileEvent, handler)
+
+    def remove(self, eventType, handler):
+        self.handlers[eventType].remove(handler)
+
+class EventPump(_Handlers):
+    """Polls events on a background thread"""
+    def __init__(self, mc, interval=0.1, maxQueue=1000, block=False,
+                 channels=("block", "chat", "projectile")):
+        _Handlers.__init__(self, channels)
+        self.mc = mc
+        self.interval = interval
+        self.block = block
+        self.queue = queue.Queue(maxQueue)
+        self.error = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    @staticmethod
+    def create(address = "localhost", port = 4711, **kwargs):
+        """Create a pump with a connection of its own"""
+        return EventPump(Minecraft.create(address, port), **kwargs)
+
+    def poll(self):
+        """Poll every channel in one batch and queue the events => count queued"""
+        with self.mc.conn.pipeline() as pipe:
+            replies = [(pipe.sendReceive(_commands[c][0]), _commands[c][1])
+                       for c in self.channels]
+        self.polls += 1
+        queued = 0
+        for reply, parse in replies:
+            for event in parse(reply.result()):
+                queued += self._queue(event)
+        return queued
+
+    def _queue(self, event):
+        """Queue an event, waiting for room or dropping it => 1 if queued"""
+        self.received += 1
+        if self.block:
+            while not self._stop.is_set():
+                try:
+                    self.queue.put(event, timeout=0.1)
+                    return 1
+                except queue.Full:
+                    pass
+            return 0
+        try:
+            self.queue.put_nowait(event)
+            return 1
+        except queue.Full:
+            self.dropped += 1
+            return 0
+
+    def dispatch(self, maxEvents=None, timeout=0):
+        """Call the handlers for queued events => count dispatched
+
+        Waits up to timeout seconds for the first event. Raises the error
+        which stopped the background threads once the queue is empty."""
+        count = 0
+        while maxEvents is None or count < maxEvents:
+            try:
+                if count == 0 and timeout:
+                    event = self.queue.get(timeout=timeout)
+                else:
+                    event = self.queue.get_nowait()
+            except queue.Empty:
+                if self.error is not None and count == 0:
+                    raise self.error
+                break
+            for handler in self.handlers[type(event)]:
+                handler(event)
+            count += 1
+        return count
+
+    def _failed(self, error):
+        """Stop the pump, keeping the first error"""
+        if self.error is None:
+            self.error = error
+            log.error("Event pump stopped", exc_info=error)
+        self._stop.set()
+
+    def _pollLoop(self):
+        while not self._stop.is_set():
+            start = time.time()
+            try:
+                self.poll()
+            except Exception as e:
+                self._failed(e)
+                return
+            self._stop.wait(max(0, self.interval - (time.time() - start)))
+
+    def _dispatchLoop(self):
+        while not self._stop.is_set():
+            try:
+                self.dispatch(timeout=0.1)
+            except Exception as e:
+                self._failed(e)
+                return
+
+    @property
+    def running(self):
+        """Whether the background threads are alive"""
+        return any(t.is_alive() for t in self._threads)
+
+    def start(self, dispatch=False):
+        """Start polling on a daemon thread, and dispatching on another if
+        dispatch is True (otherwise call dispatch() from your own loop)"""
+        self._stop.clear()
+        self.error = None
+        targets = [self._pollLoop] + ([self._dispatchLoop] if dispatch else [])
+        self._threads = [threading.Thread(target=t) for t in targets]
+        for t in self._threads:
+            t.daemon = True
+            t.start()
+        return self
+
+    def stop(self):
+        """Stop the background threads"""
+        self._stop.set()
+        for t in self._threads:
+            t.join()
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+_entityCommands = {
+    "block": (b"entity.events.block.hits", parseBlockHits),
+    "chat": (b"entity.events.chat.posts", parseChatPosts),
+    "projectile": (b"entity.events.projectile.hits", parseProjectileHits),
+}
+
+class _PlayerState:
+    __slots__ = ("id", "interval", "nextDue", "polls", "events")
+
+    def __init__(self, id, interval, now):
+        self.id = id
+        self.interval = interval
+        self.nextDue = now
+        self.polls = 0
+        self.events = 0
+
+class PlayerEventPump(EventPump):
+    """Polls the event queues of each connected player, adaptively
+
+    Players whose last poll returned events are polled again after
+    minInterval, quiet players back off by a factor of backoff up to
+    maxInterval. However many players there are, no more than maxRate
+    requests per second are sent, the players which have been waiting
+    longest going first. Player ids are refreshed from
+    world.getPlayerIds every refresh seconds.
+
+    Handlers, the queue, dispatch(), start() and stop() work as they do on
+    EventPump. interval is how often the scheduler wakes up to look for
+    players which are due."""
+    def __init__(self, mc, maxRate=50.0, minInterval=0.1, maxInterval=5.0,
+                 backoff=2.0, refresh=10.0, interval=0.05, maxQueue=1000,
+                 block=False, channels=("block", "chat", "projectile")):
+        EventPump.__init__(self, mc, interval, maxQueue, block, channels)
+        self.maxRate = maxRate
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.backoff = backoff
+        self.refresh = refresh
+        self.players = {}
+        self._nextRefresh = 0
+        # start with a full budget so the first poll can refresh and poll
+        self._tokens = max(maxRate, len(self.channels) + 1)
+        self._lastRefill = time.time()
+
+    @staticmethod
+    def create(address = "localhost", port = 4711, **kwargs):
+        """Create a pump with a connection of its own"""
+        return PlayerEventPump(Minecraft.create(address, port), **kwargs)
+
+    def refreshPlayers(self, now=None):
+        """Fetch the connected player ids, adding new and dropping gone players
+
+        New players are due at now, by default the current time."""
+        if now is None:
+            now = time.time()
+        try:
+            reply = self.mc.conn.sendReceive(b"world.getPlayerIds")
+        except RequestError:
+            # the server fails the request when nobody is online
+            reply = ""
+        ids = set(int(i) for i in reply.split("|") if i)
+        for id in ids:
+            if id not in self.players:
+                self.players[id] = _PlayerState(id, self.minInterval, now)
+        for id in list(self.players):
+            if id not in ids:
+                del self.players[id]
+        self._nextRefresh = now + self.refresh
+
+    def poll(self):
+        """Poll the players which are due, within the request budget => count queued"""
+        now = time.time()
+        cost = len(self.channels)
+        capacity = max(self.maxRate, cost + 1)
+        self._tokens = min(capacity, self._tokens + (now - self._lastRefill) * self.maxRate)
+        self._lastRefill = now
+        if now >= self._nextRefresh and self._tokens >= 1:
+            self._tokens -= 1
+            self.refreshPlayers(now)
+
+        due = [p for p in self.players.values() if p.nextDue <= now]
+        if not due or self._tokens < cost:
+            return 0
+        due.sort(key=lambda p: p.nextDue)
+        due = due[:int(self._tokens // cost)]
+        self._tokens -= cost * len(due)
+
+        with self.mc.conn.pipeline() as pipe:
+            replies = [(player, [(pipe.sendReceive(_entityCommands[c][0], player.id), _entityCommands[c][1])
+                                 for c in self.channels])
+                       for player in due]
+        self.polls += 1
+        queued = 0
+        for player, channelReplies in replies:
+            events = 0
+            gone = False
+            for reply, parse in channelReplies:
+                try:
+                    result = reply.result()
+                except RequestError:
+                    # the player left since the last refresh
+                    gone = True
+                    continue
+                for event in parse(result):
+                    events += 1
+                    queued += self._queue(event)
+            if gone:
+                self.players.pop(player.id, None)
+                continue
+            player.polls += 1
+            player.events += events
+            if events:
+                player.interval = self.minInterval
+            else:
+                player.interval = min(player.interval * self.backoff, self.maxInterval)
+            player.nextDue = now + player.interval
+        return queued
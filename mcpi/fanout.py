@@ -0,0 +1,367 @@
+import errno
+import logging
+import selectors
+import socket
+import time
+from collections import namedtuple
+from .connection import RequestError, _decode, _encodeCommand
+from .minecraft import Minecraft
+
+""" Send the same commands to many games at once, e.g. to mirror a build
+    to every Raspberry Pi in a classroom.
+
+        fan = FanOut(["pi01:4711", "pi02:4711", ("10.0.0.3", 4711)])
+        mc = fan.minecraft()
+        mc.setBlocks(0, 0, 0, 10, 10, 10, block.STONE)   # built on every game
+        replies = fan.query(b"world.getHeight", 0, 0)
+        for host, r in replies.items():
+            print(host, r.reply, r.error, r.seconds)
+        fan.close()
+
+    Each command is encoded once and the same bytes are written to every
+    game through non-blocking sockets driven by a selector, so a slow game
+    does not hold up the others. Queries gather a reply, or the reason
+    there was none, from every game along with how long it took.
+
+    A game which fails (cannot be reached, closes the connection, or does
+    not reply within timeout seconds) is marked down, its error recorded in
+    failures, and left out until reconnect() is called; it misses whatever
+    is sent while it is down. Replies of Fail are reported per game and do
+    not mark it down.
+
+    The Minecraft returned by minecraft() sends every command to all the
+    games. Its getters return the reply of the first game, in the order
+    given, which answered; the replies of all the games are in lastReplies."""
+
+log = logging.getLogger(__name__)
+
+class HostReply(namedtuple("HostReply", "reply error seconds")):
+    """The reply of one game: the reply str (bytes from queryBytes), or the
+    error raised, and the seconds it took"""
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return self.error is None
+
+class Replies(dict):
+    """{host: HostReply} for one query"""
+    def ok(self):
+        """{host: reply} of the games which replied"""
+        return dict((h, r.reply) for h, r in self.items() if r.error is None)
+
+    def failed(self):
+        """{host: error} of the games which did not"""
+        return dict((h, r.error) for h, r in self.items() if r.error is not None)
+
+def _hostKey(host):
+    """"address:port" or (address, port) => (key, address, port)"""
+    if isinstance(host, str):
+        address, _, port = host.rpartition(":")
+        if not address:
+            address, port = host, 4711
+        return host, address, int(port)
+    address, port = host
+    return "%s:%d" % (address, port), address, int(port)
+
+class _Host:
+    __slots__ = ("key", "address", "port", "socket", "out", "inbuf", "error",
+                 "commands", "requests", "seconds", "failures")
+
+    def __init__(self, key, address, port):
+        self.key = key
+        self.address = address
+        self.port = port
+        self.socket = None
+        self.out = bytearray()
+        self.inbuf = bytearray()
+        self.error = None
+        self.commands = 0
+        self.requests = 0
+        self.seconds = 0.0
+        self.failures = 0
+
+class FanOut:
+    """Connections to many games, written to and read from concurrently"""
+    def __init__(self, hosts, timeout=5.0):
+        self.timeout = timeout
+        self.hosts = []
+        for host in hosts:
+            self.hosts.append(_Host(*_hostKey(host)))
+        self.lastReplies = Replies()
+        self._selector = selectors.DefaultSelector()
+        self._connect(self.hosts)
+
+    def minecraft(self):
+        """A Minecraft which sends every command to all the games"""
+        return Minecraft(self)
+
+    @property
+    def live(self):
+        """The keys of the games which are up"""
+        return [h.key for h in self.hosts if h.error is None]
+
+    @property
+    def failures(self):
+        """{host: error} of the games which are down"""
+        return dict((h.key, h.error) for h in self.hosts if h.error is not None)
+
+    def _fail(self, host, error):
+        log.warning("%s failed: %s", host.key, error)
+        host.error = error
+        host.failures += 1
+        if host.socket is not None:
+            try:
+                self._selector.unregister(host.socket)
+            except (KeyError, ValueError):
+                pass
+            host.socket.close()
+            host.socket = None
+        del host.out[:]
+        del host.inbuf[:]
+
+    def _connect(self, hosts):
+        """Connect to hosts concurrently, marking those which fail down"""
+        # a selector of its own, so replies waiting on live games are left alone
+        connecting = selectors.DefaultSelector()
+        pending = {}
+        for host in hosts:
+            host.error = None
+            s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            s.setblocking(False)
+            try:
+                address = socket.gethostbyname(host.address)
+            except socket.error as e:
+                s.close()
+                self._fail(host, e)
+                continue
+            code = s.connect_ex((address, host.port))
+            if code not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                s.close()
+                self._fail(host, socket.error(code, "connect failed"))
+                continue
+            pending[s] = host
+            connecting.register(s, selectors.EVENT_WRITE, host)
+        deadline = time.time() + self.timeout
+        while pending:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            for key, _ in connecting.select(remaining):
+                s = key.fileobj
+                host = pending.pop(s)
+                connecting.unregister(s)
+                code = s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                if code:
+                    s.close()
+                    self._fail(host, socket.error(code, "connect failed"))
+                else:
+                    s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    host.socket = s
+                    self._selector.register(s, selectors.EVENT_READ, host)
+        connecting.close()
+        for s, host in pending.items():
+            s.close()
+            self._fail(host, socket.timeout("connect timed out"))
+
+    def reconnect(self):
+        """Try again to connect to the games which are down => keys now up"""
+        down = [h for h in self.hosts if h.error is not None]
+        self._connect(down)
+        return [h.key for h in down if h.error is None]
+
+    def _drain(self, host):
+        """Read and discard stray data from host"""
+        while True:
+            try:
+                data = host.socket.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except socket.error as e:
+                self._fail(host, e)
+                return
+            if not data:
+                self._fail(host, socket.error("Connection closed by the server"))
+                return
+            log.warning("%s drained data: <%s>", host.key, data.strip())
+        if host.inbuf:
+            log.warning("%s drained data: <%s>", host.key, bytes(host.inbuf).strip())
+            del host.inbuf[:]
+
+    def _write(self, s):
+        """Write s to every live game, waiting until all of it is written"""
+        live = [h for h in self.hosts if h.error is None]
+        for host in live:
+            host.out += s
+            host.commands += 1
+        blocked = []
+        for host in live:
+            self._writeSome(host)
+            if host.out and host.error is None:
+                blocked.append(host)
+        if not blocked:
+            # the usual case, every game took all of s at once
+            return
+        # only the games still being written to are watched, so replies
+        # waiting on the others stay unread until they are asked for
+        writing = selectors.DefaultSelector()
+        for host in blocked:
+            writing.register(host.socket, selectors.EVENT_READ | selectors.EVENT_WRITE, host)
+        waiting = len(blocked)
+        deadline = time.time() + self.timeout
+        while waiting:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                for key in list(writing.get_map().values()):
+                    writing.unregister(key.fileobj)
+                    self._fail(key.data, socket.timeout("write timed out"))
+                break
+            for key, events in writing.select(remaining):
+                host = key.data
+                if events & selectors.EVENT_READ:
+                    # s is not all written yet, so this is stray data, e.g.
+                    # Fail for an earlier command without a reply
+                    self._drain(host)
+                if events & selectors.EVENT_WRITE and host.error is None:
+                    self._writeSome(host)
+                if host.error is not None or not host.out:
+                    writing.unregister(key.fileobj)
+                    waiting -= 1
+        writing.close()
+
+    def _writeSome(self, host):
+        try:
+            n = host.socket.send(host.out)
+            del host.out[:n]
+        except (BlockingIOError, InterruptedError):
+            pass
+        except socket.error as e:
+            self._fail(host, e)
+
+    def _readSome(self, host):
+        try:
+            data = host.socket.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except socket.error as e:
+            self._fail(host, e)
+            return
+        if not data:
+            self._fail(host, socket.error("Connection closed by the server"))
+            return
+        host.inbuf += data
+
+    def send(self, f, *data):
+        """Send a command to every live game"""
+        self._write(_encodeCommand(f, data))
+
+    def query(self, f, *data):
+        """Send a request to every live game and gather the replies => Replies"""
+        return self._query(f, data, True)
+
+    def queryBytes(self, f, *data):
+        """query, with the replies as the bytes read"""
+        return self._query(f, data, False)
+
+    def _query(self, f, data, decode):
+        s = _encodeCommand(f, data)
+        for host in self.hosts:
+            if host.error is None:
+                self._drain(host)
+        start = time.time()
+        live = [h for h in self.hosts if h.error is None]
+        self._write(s)
+        replies = Replies()
+        waiting = set()
+        for host in live:
+            if host.error is not None:
+                replies[host.key] = HostReply(None, host.error, time.time() - start)
+            else:
+                host.requests += 1
+                waiting.add(host)
+        deadline = start + self.timeout
+
+        def collect(host):
+            end = host.inbuf.find(b"\n")
+            if end < 0:
+                return False
+            line = bytes(host.inbuf[:end])
+            del host.inbuf[:end + 1]
+            seconds = time.time() - start
+            host.seconds += seconds
+            if line == b"Fail":
+                replies[host.key] = HostReply(None, RequestError("%s failed on %s" % (s.strip(), host.key)), seconds)
+            else:
+                replies[host.key] = HostReply(_decode(line) if decode else line, None, seconds)
+            return True
+
+        for host in list(waiting):
+            if collect(host):
+                waiting.discard(host)
+        while waiting:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                for host in waiting:
+                    self._fail(host, socket.timeout("no reply within %ss" % self.timeout))
+                    replies[host.key] = HostReply(None, host.error, time.time() - start)
+                break
+            for key, events in self._selector.select(remaining):
+                host = key.data
+                if host not in waiting:
+                    continue
+                self._readSome(host)
+                if host.error is not None:
+                    waiting.discard(host)
+                    replies[host.key] = HostReply(None, host.error, time.time() - start)
+                elif collect(host):
+                    waiting.discard(host)
+        # in the order the hosts were given
+        ordered = Replies()
+        for host in self.hosts:
+            if host.key in replies:
+                ordered[host.key] = replies[host.key]
+        self.lastReplies = ordered
+        return ordered
+
+    def sendReceive(self, f, *data):
+        """Send a request to every live game => the reply of the first which answered"""
+        return self._first(f, self.query(f, *data))
+
+    def sendReceiveBytes(self, f, *data):
+        """sendReceive, with the reply as the bytes read"""
+        return self._first(f, self.queryBytes(f, *data))
+
+    def _first(self, f, replies):
+        for r in replies.values():
+            if r.error is None:
+                return r.reply
+        errors = [r.error for r in replies.values()]
+        if errors and all(isinstance(e, RequestError) for e in errors):
+            raise errors[0]
+        raise socket.error("No game replied to %s" % f.decode("ascii"))
+
+    def stats(self):
+        """Per game counters => {host: dict}"""
+        return dict((h.key, {
+            "up": h.error is None,
+            "error": None if h.error is None else str(h.error),
+            "commands": h.commands,
+            "requests": h.requests,
+            "meanSeconds": h.seconds / h.requests if h.requests else None,
+            "failures": h.failures,
+        }) for h in self.hosts)
+
+    def close(self):
+        """Close every connection"""
+        for host in self.hosts:
+            if host.socket is not None:
+                self._selector.unregister(host.socket)
+                host.socket.close()
+                host.socket = None
+        self._selector.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,264 @@
+from array import array
+from collections import OrderedDict
+from .minecraft import intFloor
+from .region import parseIds
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+""" Column heights of the world, fetched a chunk at a time and cached.
+
+        heights = HeightMap(mc)
+        grid = heights.heights(-50, -50, 50, 50)    # one pipelined batch
+        top = heights.max(10, 10, 20, 20)          # highest point of a footprint
+        heights.setBlocks(10, top + 1, 10, 20, top + 5, 20, block.STONE)
+
+    Heights are fetched for whole 16x16 chunks of columns. By default each
+    column is read with a pipelined world.getHeight, several chunks per
+    batch. When the terrain is known to lie between yMin and yMax and that
+    span is at most BlocksCheaperBelow blocks, a chunk is read with one
+    world.getBlocks instead and the height of each column is the highest
+    block that is not air; a column with no such block in the span is
+    reported as yMin - 1.
+
+    Writes made through the HeightMap, or reported to it with
+    blockChanged and blocksChanged, keep the cached heights up to date.
+    When the top block of a column is removed the column is refetched the
+    next time it is asked for."""
+
+ChunkBits = 4
+ChunkSize = 1 << ChunkBits
+ChunkColumns = ChunkSize * ChunkSize
+BlocksCheaperBelow = 16
+Unknown = -(1 << 31)
+
+def heightAfter(height, y0, y1, id):
+    """The height of a column of known height once blocks y0..y1 are set
+    to id, or None if the top block was removed and it is unknown"""
+    if id != 0:
+        return max(height, y1)
+    if y0 <= height <= y1:
+        return None
+    return height
+
+class HeightGrid:
+    """Heights of a rectangle of columns, an array('l') indexed [x][z]
+    relative to origin (x0, z0)"""
+    def __init__(self, origin, shape, heights):
+        self.origin = origin
+        self.shape = shape
+        self.heights = heights
+
+    def get(self, x, z):
+        """The height of world column (x,z)"""
+        return self.heights[(x - self.origin[0]) * self.shape[1] + (z - self.origin[1])]
+
+    def max(self):
+        return max(self.heights)
+
+    def min(self):
+        return min(self.heights)
+
+    def toNumpy(self):
+        """The heights as a NumPy array of shape (width, depth)"""
+        if numpy is None:
+            raise ImportError("numpy is required for toNumpy")
+        return numpy.frombuffer(self.heights, dtype=numpy.dtype("i%d" % self.heights.itemsize)).reshape(self.shape)
+
+    def __len__(self):
+        return len(self.heights)
+
+    def __iter__(self):
+        return iter(self.heights)
+
+    def __repr__(self):
+        return "HeightGrid(%s, %s)" % (self.origin, self.shape)
+
+class HeightMap:
+    """Cache of column heights read with batched requests
+
+    method is "height", "blocks" or "auto", see the module description.
+    At most maxChunks chunks are kept, least recently used are dropped
+    first. inFlight chunks are fetched per pipelined batch."""
+    def __init__(self, mc, yMin=None, yMax=None, method="auto", maxChunks=4096, inFlight=16):
+        if method not in ("auto", "height", "blocks"):
+            raise ValueError("Unknown method %s" % method)
+        if method == "blocks" and (yMin is None or yMax is None):
+            raise ValueError("The blocks method needs yMin and yMax")
+        self.mc = mc
+        self.yMin = yMin
+        self.yMax = yMax
+        self.method = method
+        self.maxChunks = maxChunks
+        self.inFlight = inFlight
+        self.chunks = OrderedDict()
+        self.requests = 0
+
+    def _useBlocks(self):
+        if self.method == "auto":
+            return (self.yMin is not None and self.yMax is not None and
+                    self.yMax - self.yMin + 1 <= BlocksCheaperBelow)
+        return self.method == "blocks"
+
+    def _fetchHeights(self, columns):
+        """Read columns [(x,z)] with pipelined world.getHeight => [height]"""
+        heights = []
+        step = self.inFlight * ChunkColumns
+        for i in range(0, len(columns), step):
+            with self.mc.conn.pipeline() as pipe:
+                replies = [pipe.sendReceive(b"world.getHeight", x, z) for x, z in columns[i:i + step]]
+            heights.extend(int(r.resultBytes()) for r in replies)
+            self.requests += len(replies)
+        return heights
+
+    def _fetchBlocks(self, keys):
+        """Read chunks with one world.getBlocks each => [array of heights]"""
+        y0, y1 = self.yMin, self.yMax
+        ny = y1 - y0 + 1
+        result = []
+        for i in range(0, len(keys), self.inFlight):
+            with self.mc.conn.pipeline() as pipe:
+                replies = []
+                for cx, cz in keys[i:i + self.inFlight]:
+                    x0, z0 = cx << ChunkBits, cz << ChunkBits
+                    replies.append(pipe.sendReceive(b"world.getBlocks",
+                        x0, y0, z0, x0 + ChunkSize - 1, y1, z0 + ChunkSize - 1))
+            self.requests += len(replies)
+            for reply in replies:
+                ids = parseIds(reply.resultBytes())
+                heights = array("l", [y0 - 1]) * ChunkColumns
+                unresolved = set(range(ChunkColumns))
+                # replies are [y][x][z], so one layer is in the same order as a chunk
+                for y in range(ny - 1, -1, -1):
+                    layer = y * ChunkColumns
+                    found = [c for c in unresolved if ids[layer + c]]
+                    for c in found:
+                        heights[c] = y0 + y
+                    unresolved.difference_update(found)
+                    if not unresolved:
+                        break
+                result.append(heights)
+        return result
+
+    def _fetch(self, keys):
+        """Fetch and cache the chunks keys [(cx,cz)]"""
+        if self._useBlocks():
+            chunks = self._fetchBlocks(keys)
+        else:
+            columns = [((cx << ChunkBits) + i, (cz << ChunkBits) + j)
+                       for cx, cz in keys for i in range(ChunkSize) for j in range(ChunkSize)]
+            flat = self._fetchHeights(columns)
+            chunks = [array("l", flat[k * ChunkColumns:(k + 1) * ChunkColumns]) for k in range(len(keys))]
+        for key, heights in zip(keys, chunks):
+            self.chunks[key] = heights
+        while len(self.chunks) > self.maxChunks:
+            self.chunks.popitem(last=False)
+
+    def _load(self, keys):
+        """Make sure chunks keys are cached and their columns known => {key: heights}"""
+        missing = [k for k in keys if k not in self.chunks]
+        if missing:
+            self._fetch(missing)
+        loaded = {}
+        unknown = []
+        for key in keys:
+            heights = self.chunks.get(key)
+            if heights is None:
+                # dropped to make room, keys is larger than maxChunks
+                self._fetch([key])
+                heights = self.chunks[key]
+            self.chunks.move_to_end(key)
+            loaded[key] = heights
+            unknown.extend((key, c) for c in range(ChunkColumns) if heights[c] == Unknown)
+        if unknown:
+            columns = [((key[0] << ChunkBits) + (c >> ChunkBits), (key[1] << ChunkBits) + (c & (ChunkSize - 1)))
+                       for key, c in unknown]
+            for (key, c), h in zip(unknown, self._fetchHeights(columns)):
+                loaded[key][c] = h
+        return loaded
+
+    def get(self, *args):
+        """The height of column (x,z)"""
+        x, z = intFloor(args)
+        key = (x >> ChunkBits, z >> ChunkBits)
+        heights = self._load([key])[key]
+        return heights[((x & (ChunkSize - 1)) << ChunkBits) | (z & (ChunkSize - 1))]
+
+    def heights(self, x0, z0, x1, z1):
+        """The heights of a rectangle of columns => HeightGrid"""
+        x0, z0, x1, z1 = intFloor(x0, z0, x1, z1)
+        x0, x1 = min(x0, x1), max(x0, x1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        keys = [(cx, cz) for cx in range(x0 >> ChunkBits, (x1 >> ChunkBits) + 1)
+                for cz in range(z0 >> ChunkBits, (z1 >> ChunkBits) + 1)]
+        chunks = self._load(keys)
+        width, depth = x1 - x0 + 1, z1 - z0 + 1
+        grid = array("l", [0]) * (width * depth)
+        m = ChunkSize - 1
+        for x in range(x0, x1 + 1):
+            row = (x - x0) * depth
+            z = z0
+            while z <= z1:
+                # copy the run of this row which lies in one chunk
+                end = min(z1, z | m)
+                heights = chunks[(x >> ChunkBits, z >> ChunkBits)]
+                i = ((x & m) << ChunkBits) | (z & m)
+                grid[row + z - z0:row + end - z0 + 1] = heights[i:i + end - z + 1]
+                z = end + 1
+        return HeightGrid((x0, z0), (width, depth), grid)
+
+    def max(self, x0, z0, x1, z1):
+        """The highest column of a rectangle"""
+        return self.heights(x0, z0, x1, z1).max()
+
+    def min(self, x0, z0, x1, z1):
+        """The lowest column of a rectangle"""
+        return self.heights(x0, z0, x1, z1).min()
+
+    def blocksChanged(self, x0, y0, z0, x1, y1, z1, id):
+        """Update the cached heights for a cuboid set to block id"""
+        x0, x1 = min(x0, x1), max(x0, x1)
+        y0, y1 = min(y0, y1), max(y0, y1)
+        z0, z1 = min(z0, z1), max(z0, z1)
+        m = ChunkSize - 1
+        for cx in range(x0 >> ChunkBits, (x1 >> ChunkBits) + 1):
+            for cz in range(z0 >> ChunkBits, (z1 >> ChunkBits) + 1):
+                heights = self.chunks.get((cx, cz))
+                if heights is None:
+                    continue
+                for x in range(max(x0, cx << ChunkBits), min(x1, (cx << ChunkBits) | m) + 1):
+                    for z in range(max(z0, cz << ChunkBits), min(z1, (cz << ChunkBits) | m) + 1):
+                        i = ((x & m) << ChunkBits) | (z & m)
+                        h = heights[i]
+                        if h == Unknown:
+                            continue
+                        h = heightAfter(h, y0, y1, id)
+                        heights[i] = Unknown if h is None else h
+
+    def blockChanged(self, x, y, z, id):
+        """Update the cached height for a block set to id"""
+        self.blocksChanged(x, y, z, x, y, z, id)
+
+    def setBlock(self, *args):
+        """Set block (x,y,z,id,[data]) and update the heights"""
+        args = intFloor(args)
+        self.mc.setBlock(args)
+        self.blockChanged(*args[:4])
+
+    def setBlocks(self, *args):
+        """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data]) and update the heights"""
+        args = intFloor(args)
+        self.mc.setBlocks(args)
+        self.blocksChanged(*args[:7])
+
+    def invalidate(self, x0, z0, x1, z1):
+        """Forget the chunks overlapping a rectangle"""
+        for cx in range(min(x0, x1) >> ChunkBits, (max(x0, x1) >> ChunkBits) + 1):
+            for cz in range(min(z0, z1) >> ChunkBits, (max(z0, z1) >> ChunkBits) + 1):
+                self.chunks.pop((cx, cz), None)
+
+    def clear(self):
+        """Forget everything"""
+        self.chunks.clear()
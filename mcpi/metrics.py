@@ -0,0 +1,191 @@
+import threading
+import time
+from bisect import bisect_left
+
+""" Client side instrumentation of a Connection.
+
+        metrics = Metrics()
+        mc = Minecraft.create(metrics=metrics)
+        ...
+        metrics.snapshot()["commands"]["world.getBlock"]["latency"]["p99"]
+        print(metrics.prometheus())
+
+    Metrics counts, per command, the calls, failed requests, bytes sent and
+    bytes received, and keeps a histogram of how long each call took: the
+    round trip for requests with a reply, the time to hand the command to
+    the socket (or send buffer) for commands without one, and for pipelined
+    requests the time from the pipeline being flushed to the reply being
+    read. It also counts the checks for stray data and the data drained.
+
+    A Connection without metrics only pays for one attribute test per
+    command. A Metrics can be shared by several connections, e.g. those of
+    a ConnectionPool.
+
+    Hooks are called after every command as hook(command, seconds, sent,
+    received, failed), where seconds is None for pipelined commands without
+    a reply, and can be used to feed a tracer."""
+
+# perf_counter is Python 3.3+, fall back to time.time on older Pythons
+clock = getattr(time, "perf_counter", time.time)
+
+# upper bounds in seconds, from 50us to 5s
+DefaultBuckets = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                  0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class Histogram:
+    """Counts of observations falling under each bucket upper bound, with
+    one more bucket for anything larger"""
+    def __init__(self, buckets=DefaultBuckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimate the q quantile (0 to 1) by interpolating within its bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": list(zip(self.buckets + (float("inf"),), self.counts)),
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+        }
+
+class CommandStats:
+    """The counters of one command"""
+    __slots__ = ("calls", "failed", "bytesSent", "bytesReceived", "latency")
+
+    def __init__(self, buckets):
+        self.calls = 0
+        self.failed = 0
+        self.bytesSent = 0
+        self.bytesReceived = 0
+        self.latency = Histogram(buckets)
+
+class Metrics:
+    """Counters and latency histograms of the commands sent on one or more
+    connections"""
+    def __init__(self, buckets=DefaultBuckets):
+        self.buckets = tuple(buckets)
+        self.commands = {}
+        self.drainChecks = 0
+        self.drains = 0
+        self.drainedBytes = 0
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def record(self, command, sent, received, seconds, failed=False):
+        """Record one command (bytes, as sent) => None
+
+        seconds may be None when there is no meaningful latency."""
+        with self._lock:
+            stats = self.commands.get(command)
+            if stats is None:
+                stats = self.commands[command] = CommandStats(self.buckets)
+            stats.calls += 1
+            stats.bytesSent += sent
+            stats.bytesReceived += received
+            if failed:
+                stats.failed += 1
+            if seconds is not None:
+                stats.latency.observe(seconds)
+        for hook in self.hooks:
+            hook(command.decode("ascii"), seconds, sent, received, failed)
+
+    def drainChecked(self, drained):
+        """Record a check for stray data which drained drained bytes"""
+        with self._lock:
+            self.drainChecks += 1
+            if drained:
+                self.drains += 1
+                self.drainedBytes += drained
+
+    def addHook(self, hook):
+        """Call hook(command, seconds, sent, received, failed) after every command"""
+        self.hooks.append(hook)
+        return hook
+
+    def removeHook(self, hook):
+        self.hooks.remove(hook)
+
+    def reset(self):
+        """Zero every counter"""
+        with self._lock:
+            self.commands = {}
+            self.drainChecks = self.drains = self.drainedBytes = 0
+
+    def snapshot(self):
+        """All the counters as plain dicts and lists, e.g. for JSON"""
+        with self._lock:
+            commands = dict((command.decode("ascii"), {
+                "calls": s.calls,
+                "failed": s.failed,
+                "bytesSent": s.bytesSent,
+                "bytesReceived": s.bytesReceived,
+                "latency": s.latency.snapshot(),
+            }) for command, s in self.commands.items())
+            return {
+                "commands": commands,
+                "drainChecks": self.drainChecks,
+                "drains": self.drains,
+                "drainedBytes": self.drainedBytes,
+            }
+
+    def prometheus(self, prefix="mcpi"):
+        """The counters in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        commands = sorted(snapshot["commands"].items())
+        lines = []
+
+        def family(name, kind, help, samples):
+            lines.append("# HELP %s_%s %s" % (prefix, name, help))
+            lines.append("# TYPE %s_%s %s" % (prefix, name, kind))
+            lines.extend(samples)
+
+        def perCommand(name, key):
+            return ['%s_%s{command="%s"} %d' % (prefix, name, c, s[key]) for c, s in commands]
+
+        family("commands_total", "counter", "Commands sent", perCommand("commands_total", "calls"))
+        family("command_failures_total", "counter", "Requests which replied Fail",
+               perCommand("command_failures_total", "failed"))
+        family("sent_bytes_total", "counter", "Bytes sent", perCommand("sent_bytes_total", "bytesSent"))
+        family("received_bytes_total", "counter", "Bytes received",
+               perCommand("received_bytes_total", "bytesReceived"))
+        samples = []
+        for c, s in commands:
+            latency = s["latency"]
+            cumulative = 0
+            for bound, n in latency["buckets"]:
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                samples.append('%s_command_seconds_bucket{command="%s",le="%s"} %d' % (prefix, c, le, cumulative))
+            samples.append('%s_command_seconds_sum{command="%s"} %r' % (prefix, c, latency["sum"]))
+            samples.append('%s_command_seconds_count{command="%s"} %d' % (prefix, c, latency["count"]))
+        family("command_seconds", "histogram", "Command latency", samples)
+        family("drain_checks_total", "counter", "Checks for stray data",
+               ["%s_drain_checks_total %d" % (prefix, snapshot["drainChecks"])])
+        family("drains_total", "counter", "Checks which found stray data",
+               ["%s_drains_total %d" % (prefix, snapshot["drains"])])
+        family("drained_bytes_total", "counter", "Stray bytes drained",
+               ["%s_drained_bytes_total %d" % (prefix, snapshot["drainedBytes"])])
+        return "\n".join(lines) + "\n"
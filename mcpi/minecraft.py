@@ -3,8 +3,9 @@ from .vec3 import Vec3
 from .event import BlockEvent, ChatEvent, ProjectileEvent
 from .entity import Entity
 from .block import Block
-import math
-from .util import flatten
+from .region import BlockRegion, cuboid, parseIds, parseIdsNumpy
+from .parse import parseEntities, parseEntityColumns, parseBlockHits, parseChatPosts, parseProjectileHits
+from .util import flatten, flatten_to_ints
 
 """ Minecraft PI low level api v0.1_1
 
@@ -20,6 +21,8 @@ from .util import flatten
 
 """ Updated to include functionality provided by RaspberryJuice:
 - getBlocks()
+- getBlocksArray()
+- getBlocksNumpy()
 - getDirection()
 - getPitch()
 - getRotation()
@@ -33,7 +36,7 @@ from .util import flatten
 """
 
 def intFloor(*args):
-    return [int(math.floor(x)) for x in flatten(args)]
+    return flatten_to_ints(args)
 
 class CmdPositioner:
     """Methods for setting and getting positions"""
@@ -43,8 +46,8 @@ class CmdPositioner:
 
     def getPos(self, id):
         """Get entity position (entityId:int) => Vec3"""
-        s = self.conn.sendReceive(self.pkg + b".getPos", id)
-        return Vec3(*list(map(float, s.split(","))))
+        s = self.conn.sendReceiveBytes(self.pkg + b".getPos", id)
+        return Vec3(*list(map(float, s.split(b","))))
 
     def setPos(self, id, *args):
         """Set entity position (entityId:int, x,y,z)"""
@@ -52,8 +55,8 @@ class CmdPositioner:
 
     def getTilePos(self, id):
         """Get entity tile position (entityId:int) => Vec3"""
-        s = self.conn.sendReceive(self.pkg + b".getTile", id)
-        return Vec3(*list(map(int, s.split(","))))
+        s = self.conn.sendReceiveBytes(self.pkg + b".getTile", id)
+        return Vec3(*list(map(int, s.split(b","))))
 
     def setTilePos(self, id, *args):
         """Set entity tile position (entityId:int) => Vec3"""
@@ -65,8 +68,8 @@ class CmdPositioner:
 
     def getDirection(self, id):
         """Get entity direction (entityId:int) => Vec3"""
-        s = self.conn.sendReceive(self.pkg + b".getDirection", id)
-        return Vec3(*map(float, s.split(",")))
+        s = self.conn.sendReceiveBytes(self.pkg + b".getDirection", id)
+        return Vec3(*map(float, s.split(b",")))
 
     def setRotation(self, id, yaw):
         """Set entity rotation (entityId:int, yaw)"""
@@ -74,7 +77,7 @@ class CmdPositioner:
 
     def getRotation(self, id):
         """get entity rotation (entityId:int) => float"""
-        return float(self.conn.sendReceive(self.pkg + b".getRotation", id))
+        return float(self.conn.sendReceiveBytes(self.pkg + b".getRotation", id))
 
     def setPitch(self, id, pitch):
         """Set entity pitch (entityId:int, pitch)"""
@@ -82,7 +85,7 @@ class CmdPositioner:
 
     def getPitch(self, id):
         """get entity pitch (entityId:int) => float"""
-        return float(self.conn.sendReceive(self.pkg + b".getPitch", id))
+        return float(self.conn.sendReceiveBytes(self.pkg + b".getPitch", id))
 
     def setting(self, setting, status):
         """Set a player setting (setting, status). keys: autojump"""
@@ -99,45 +102,29 @@ class CmdEntity(CmdPositioner):
         Also can be used to find name of entity if entity is not a player."""
         return self.conn.sendReceive(b"entity.getName", id)
 
-    def getEntities(self, id, distance=10, typeId=-1):
-        """Return a list of entities near entity (playerEntityId:int, distanceFromPlayerInBlocks:int, typeId:int) => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
+    def getEntities(self, id, distance=10, typeId=-1, columns=False):
+        """Return a list of entities near entity (playerEntityId:int, distanceFromPlayerInBlocks:int, typeId:int) => [EntityInfo(entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float)]"""
         """If distanceFromPlayerInBlocks:int is not specified then default 10 blocks will be used"""
+        """If columns is True an EntityColumns of arrays is returned instead"""
         s = self.conn.sendReceive(b"entity.getEntities", id, distance, typeId)
-        entities = [e for e in s.split("|") if e]
-        return [ [int(n.split(",")[0]), int(n.split(",")[1]), n.split(",")[2], float(n.split(",")[3]), float(n.split(",")[4]), float(n.split(",")[5])] for n in entities]
+        return parseEntityColumns(s) if columns else parseEntities(s)
 
     def removeEntities(self, id, distance=10, typeId=-1):
         """Remove entities all entities near entity (playerEntityId:int, distanceFromPlayerInBlocks:int, typeId:int, ) => (removedEntitiesCount:int)"""
         """If distanceFromPlayerInBlocks:int is not specified then default 10 blocks will be used"""
-        return int(self.conn.sendReceive(b"entity.removeEntities", id, distance, typeId))
+        return int(self.conn.sendReceiveBytes(b"entity.removeEntities", id, distance, typeId))
 
     def pollBlockHits(self, *args):
         """Only triggered by sword => [BlockEvent]"""
-        s = self.conn.sendReceive(b"entity.events.block.hits", intFloor(args))
-        events = [e for e in s.split("|") if e]
-        return [BlockEvent.Hit(*list(map(int, e.split(",")))) for e in events]
+        return parseBlockHits(self.conn.sendReceive(b"entity.events.block.hits", intFloor(args)))
 
     def pollChatPosts(self, *args):
         """Triggered by posts to chat => [ChatEvent]"""
-        s = self.conn.sendReceive(b"entity.events.chat.posts", intFloor(args))
-        events = [e for e in s.split("|") if e]
-        return [ChatEvent.Post(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in events]
+        return parseChatPosts(self.conn.sendReceive(b"entity.events.chat.posts", intFloor(args)))
     
     def pollProjectileHits(self, *args):
         """Only triggered by projectiles => [BlockEvent]"""
-        s = self.conn.sendReceive(b"entity.events.projectile.hits", intFloor(args))
-        events = [e for e in s.split("|") if e]
-        results = []
-        for e in events:
-            info = e.split(",")
-            results.append(ProjectileEvent.Hit(
-                int(info[0]), 
-                int(info[1]), 
-                int(info[2]), 
-                int(info[3]), 
-                info[4],
-                info[5]))
-        return results
+        return parseProjectileHits(self.conn.sendReceive(b"entity.events.projectile.hits", intFloor(args)))
 
     def clearEvents(self, *args):
         """Clear the entities events"""
@@ -170,45 +157,29 @@ class CmdPlayer(CmdPositioner):
     def getPitch(self):
         return CmdPositioner.getPitch(self, [])
 
-    def getEntities(self, distance=10, typeId=-1):
-        """Return a list of entities near entity (distanceFromPlayerInBlocks:int, typeId:int) => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
+    def getEntities(self, distance=10, typeId=-1, columns=False):
+        """Return a list of entities near entity (distanceFromPlayerInBlocks:int, typeId:int) => [EntityInfo(entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float)]"""
         """If distanceFromPlayerInBlocks:int is not specified then default 10 blocks will be used"""
+        """If columns is True an EntityColumns of arrays is returned instead"""
         s = self.conn.sendReceive(b"player.getEntities", distance, typeId)
-        entities = [e for e in s.split("|") if e]
-        return [ [int(n.split(",")[0]), int(n.split(",")[1]), n.split(",")[2], float(n.split(",")[3]), float(n.split(",")[4]), float(n.split(",")[5])] for n in entities]
+        return parseEntityColumns(s) if columns else parseEntities(s)
 
     def removeEntities(self, distance=10, typeId=-1):
         """Remove entities all entities near entity (distanceFromPlayerInBlocks:int, typeId:int, ) => (removedEntitiesCount:int)"""
         """If distanceFromPlayerInBlocks:int is not specified then default 10 blocks will be used"""
-        return int(self.conn.sendReceive(b"player.removeEntities", distance, typeId))
+        return int(self.conn.sendReceiveBytes(b"player.removeEntities", distance, typeId))
 
     def pollBlockHits(self):
         """Only triggered by sword => [BlockEvent]"""
-        s = self.conn.sendReceive(b"player.events.block.hits")
-        events = [e for e in s.split("|") if e]
-        return [BlockEvent.Hit(*list(map(int, e.split(",")))) for e in events]
+        return parseBlockHits(self.conn.sendReceive(b"player.events.block.hits"))
 
     def pollChatPosts(self):
         """Triggered by posts to chat => [ChatEvent]"""
-        s = self.conn.sendReceive(b"player.events.chat.posts")
-        events = [e for e in s.split("|") if e]
-        return [ChatEvent.Post(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in events]
+        return parseChatPosts(self.conn.sendReceive(b"player.events.chat.posts"))
     
     def pollProjectileHits(self):
         """Only triggered by projectiles => [BlockEvent]"""
-        s = self.conn.sendReceive(b"player.events.projectile.hits")
-        events = [e for e in s.split("|") if e]
-        results = []
-        for e in events:
-            info = e.split(",")
-            results.append(ProjectileEvent.Hit(
-                int(info[0]), 
-                int(info[1]), 
-                int(info[2]), 
-                int(info[3]), 
-                info[4],
-                info[5]))
-        return results
+        return parseProjectileHits(self.conn.sendReceive(b"player.events.projectile.hits"))
 
     def clearEvents(self):
         """Clear the players events"""
@@ -246,31 +217,15 @@ class CmdEvents:
 
     def pollBlockHits(self):
         """Only triggered by sword => [BlockEvent]"""
-        s = self.conn.sendReceive(b"events.block.hits")
-        events = [e for e in s.split("|") if e]
-        return [BlockEvent.Hit(*list(map(int, e.split(",")))) for e in events]
+        return parseBlockHits(self.conn.sendReceive(b"events.block.hits"))
 
     def pollChatPosts(self):
         """Triggered by posts to chat => [ChatEvent]"""
-        s = self.conn.sendReceive(b"events.chat.posts")
-        events = [e for e in s.split("|") if e]
-        return [ChatEvent.Post(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in events]
+        return parseChatPosts(self.conn.sendReceive(b"events.chat.posts"))
     
     def pollProjectileHits(self):
         """Only triggered by projectiles => [BlockEvent]"""
-        s = self.conn.sendReceive(b"events.projectile.hits")
-        events = [e for e in s.split("|") if e]
-        results = []
-        for e in events:
-            info = e.split(",")
-            results.append(ProjectileEvent.Hit(
-                int(info[0]), 
-                int(info[1]), 
-                int(info[2]), 
-                int(info[3]), 
-                info[4],
-                info[5]))
-        return results
+        return parseProjectileHits(self.conn.sendReceive(b"events.projectile.hits"))
 
 class Minecraft:
     """The main class to interact with a running instance of Minecraft Pi."""
@@ -284,17 +239,37 @@ class Minecraft:
 
     def getBlock(self, *args):
         """Get block (x,y,z) => id:int"""
-        return int(self.conn.sendReceive(b"world.getBlock", intFloor(args)))
+        return int(self.conn.sendReceiveBytes(b"world.getBlock", intFloor(args)))
 
     def getBlockWithData(self, *args):
         """Get block with data (x,y,z) => Block"""
-        ans = self.conn.sendReceive(b"world.getBlockWithData", intFloor(args))
-        return Block(*list(map(int, ans.split(","))))
+        ans = self.conn.sendReceiveBytes(b"world.getBlockWithData", intFloor(args))
+        return Block(*list(map(int, ans.split(b","))))
 
     def getBlocks(self, *args):
         """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) => [id:int]"""
-        s = self.conn.sendReceive(b"world.getBlocks", intFloor(args))
-        return map(int, s.split(","))
+        s = self.conn.sendReceiveBytes(b"world.getBlocks", intFloor(args))
+        return map(int, s.split(b","))
+
+    def getBlocksArray(self, *args):
+        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) => BlockRegion
+
+        The ids are parsed straight into an array('H') indexed [y][x][z]
+        relative to the lowest corner, see mcpi.region"""
+        args = intFloor(args)
+        origin, shape = cuboid(*args)
+        s = self.conn.sendReceiveBytes(b"world.getBlocks", args)
+        return BlockRegion(origin, shape, parseIds(s))
+
+    def getBlocksNumpy(self, *args):
+        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) => numpy.ndarray
+
+        The array has shape (height, width, depth) and is indexed [y][x][z]
+        relative to the lowest corner. Requires numpy."""
+        args = intFloor(args)
+        _, shape = cuboid(*args)
+        s = self.conn.sendReceiveBytes(b"world.getBlocks", args)
+        return parseIdsNumpy(s, shape)
 
     def setBlock(self, *args):
         """Set block (x,y,z,id,[data])"""
@@ -320,20 +295,20 @@ class Minecraft:
 
     def spawnEntity(self, *args):
         """Spawn entity (x,y,z,id)"""
-        return int(self.conn.sendReceive(b"world.spawnEntity", args))
+        return int(self.conn.sendReceiveBytes(b"world.spawnEntity", args))
 
     def getHeight(self, *args):
         """Get the height of the world (x,z) => int"""
-        return int(self.conn.sendReceive(b"world.getHeight", intFloor(args)))
+        return int(self.conn.sendReceiveBytes(b"world.getHeight", intFloor(args)))
 
     def getPlayerEntityIds(self):
         """Get the entity ids of the connected players => [id:int]"""
-        ids = self.conn.sendReceive(b"world.getPlayerIds")
-        return list(map(int, ids.split("|")))
+        ids = self.conn.sendReceiveBytes(b"world.getPlayerIds")
+        return list(map(int, ids.split(b"|")))
 
     def getPlayerEntityId(self, name):
         """Get the entity id of the named player => [id:int]"""
-        return int(self.conn.sendReceive(b"world.getPlayerId", name))
+        return int(self.conn.sendReceiveBytes(b"world.getPlayerId", name))
 
     def saveCheckpoint(self):
         """Save a checkpoint that can be used for restoring the world"""
@@ -357,23 +332,25 @@ class Minecraft:
         types = [t for t in s.split("|") if t]
         return [Entity(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in types]
     
-    def getEntities(self, typeId=-1):
-        """Return a list of all currently loaded entities (EntityType:int) => [[entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float]]"""
+    def getEntities(self, typeId=-1, columns=False):
+        """Return a list of all currently loaded entities (EntityType:int) => [EntityInfo(entityId:int,entityTypeId:int,entityTypeName:str,posX:float,posY:float,posZ:float)]
+
+        If columns is True an EntityColumns of arrays is returned instead"""
         s = self.conn.sendReceive(b"world.getEntities", typeId)
-        entities = [e for e in s.split("|") if e]
-        return [[int(n.split(",")[0]), int(n.split(",")[1]), n.split(",")[2], float(n.split(",")[3]), float(n.split(",")[4]), float(n.split(",")[5])] for n in entities]
+        return parseEntityColumns(s) if columns else parseEntities(s)
 
     def removeEntity(self, id):
         """Remove entity by id (entityId:int) => (removedEntitiesCount:int)"""
-        return int(self.conn.sendReceive(b"world.removeEntity", int(id)))
+        return int(self.conn.sendReceiveBytes(b"world.removeEntity", int(id)))
 
     def removeEntities(self, typeId=-1):
         """Remove entities all currently loaded Entities by type (typeId:int) => (removedEntitiesCount:int)"""
-        return int(self.conn.sendReceive(b"world.removeEntities", typeId))
+        return int(self.conn.sendReceiveBytes(b"world.removeEntities", typeId))
 
     @staticmethod
-    def create(address = "localhost", port = 4711):
-        return Minecraft(Connection(address, port))
+    def create(address = "localhost", port = 4711, **kwargs):
+        """Connect to a game, keyword arguments are passed on to Connection"""
+        return Minecraft(Connection(address, port, **kwargs))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,559 @@
+import argparse
+import math
+import random
+import socket
+import threading
+import time
+from collections import Counter, deque
+from . import entity
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+""" A stand in for a RaspberryJuice server, for testing and benchmarking the
+    client without a game.
+
+        with MockServer(latency=0.002) as server:
+            mc = Minecraft.create(server.address, server.port)
+            mc.setBlocks(0, 0, 0, 9, 9, 9, 1)
+            server.world.getBlock(5, 5, 5)       # => (1, 0)
+            server.hitBlock(5, 9, 5)             # queue a block hit event
+            mc.events.pollBlockHits()
+
+    or as a separate process:
+
+        python -m mcpi.mockserver --port 4711 --latency 0.002
+
+    MockServer speaks the same line protocol on a local socket and keeps an
+    in memory voxel world, players, entities and event queues. Below
+    groundHeight the world is solid groundId, above it is air until written.
+    Event queues are per connection as they are on the server; events are
+    raised with hitBlock, postChat and hitProjectile.
+
+    Every command which replies is delayed by latency seconds plus up to
+    jitter seconds more, chosen at random. Commands which fail, or which are
+    not known, reply Fail."""
+
+PlayerTypeId = -1
+
+_typeNames = dict((e.id, e.name) for e in vars(entity).values() if isinstance(e, entity.Entity))
+
+class _Entity:
+    __slots__ = ("id", "typeId", "name", "x", "y", "z", "yaw", "pitch")
+
+    def __init__(self, id, typeId, name, x, y, z):
+        self.id = id
+        self.typeId = typeId
+        self.name = name
+        self.x, self.y, self.z = x, y, z
+        self.yaw = 0.0
+        self.pitch = 0.0
+
+    def record(self):
+        return "%d,%d,%s,%s,%s,%s" % (self.id, self.typeId, self.name, self.x, self.y, self.z)
+
+class MockWorld:
+    """The in memory world shared by every connection to a MockServer
+
+    Blocks which have been written are kept in a dict keyed by (x,y,z).
+    Every method is safe to call from any thread."""
+    def __init__(self, groundHeight=0, groundId=1):
+        self.groundHeight = groundHeight
+        self.groundId = groundId
+        self.blocks = {}
+        self.heights = {}
+        self.entities = {}
+        self.chat = []
+        self.settings = {}
+        self.checkpoint = None
+        self.lock = threading.RLock()
+        self._nextEntityId = 1
+
+    def _default(self, y):
+        return (self.groundId, 0) if y < self.groundHeight else (0, 0)
+
+    def getBlock(self, x, y, z):
+        """=> (id, data)"""
+        b = self.blocks.get((x, y, z))
+        return b if b is not None else self._default(y)
+
+    def setBlock(self, x, y, z, id, data=0):
+        with self.lock:
+            self._set(x, y, z, id, data)
+
+    def _set(self, x, y, z, id, data):
+        if (id, data) == self._default(y):
+            self.blocks.pop((x, y, z), None)
+        else:
+            self.blocks[(x, y, z)] = (id, data)
+        top = self.heights.get((x, z))
+        if id != 0 and (top is None or y > top):
+            self.heights[(x, z)] = y
+        elif id == 0 and top == y:
+            self._rescan(x, z, y - 1)
+
+    def _rescan(self, x, z, y):
+        """Find the new top of column (x,z) downwards from y"""
+        while y >= self.groundHeight:
+            if self.getBlock(x, y, z)[0] != 0:
+                self.heights[(x, z)] = y
+                return
+            y -= 1
+        del self.heights[(x, z)]
+
+    def setBlocks(self, x0, y0, z0, x1, y1, z1, id, data=0):
+        with self.lock:
+            for y in range(min(y0, y1), max(y0, y1) + 1):
+                for x in range(min(x0, x1), max(x0, x1) + 1):
+                    for z in range(min(z0, z1), max(z0, z1) + 1):
+                        self._set(x, y, z, id, data)
+
+    def getBlocks(self, x0, y0, z0, x1, y1, z1):
+        """Block ids of a cuboid, in the getBlocks reply order => [id]"""
+        get = self.blocks.get
+        ids = []
+        for y in range(min(y0, y1), max(y0, y1) + 1):
+            default = self._default(y)
+            for x in range(min(x0, x1), max(x0, x1) + 1):
+                ids.extend([get((x, y, z), default)[0] for z in range(min(z0, z1), max(z0, z1) + 1)])
+        return ids
+
+    def getHeight(self, x, z):
+        """The y of the highest solid block in column (x,z)"""
+        return self.heights.get((x, z), self.groundHeight - 1)
+
+    def spawnEntity(self, x, y, z, typeId, name=None):
+        """Add an entity => id"""
+        with self.lock:
+            id = self._nextEntityId
+            self._nextEntityId += 1
+            if name is None:
+                name = _typeNames.get(typeId, "UNKNOWN")
+            self.entities[id] = _Entity(id, typeId, name, x, y, z)
+            return id
+
+    def addPlayer(self, name, x=0.5, y=None, z=0.5):
+        """Add a player standing at (x,y,z), on the ground by default => id"""
+        if y is None:
+            y = float(self.groundHeight)
+        return self.spawnEntity(x, y, z, PlayerTypeId, name)
+
+    def players(self):
+        return [e for e in self.entities.values() if e.typeId == PlayerTypeId]
+
+    def entitiesNear(self, x, y, z, distance, typeId):
+        """Entities other than players within distance of (x,y,z)"""
+        d2 = distance * distance
+        return [e for e in list(self.entities.values())
+                if e.typeId != PlayerTypeId and (typeId == -1 or e.typeId == typeId)
+                and (e.x - x) ** 2 + (e.y - y) ** 2 + (e.z - z) ** 2 <= d2]
+
+    def removeEntities(self, entities):
+        with self.lock:
+            for e in entities:
+                self.entities.pop(e.id, None)
+            return len(entities)
+
+    def save(self):
+        with self.lock:
+            self.checkpoint = (dict(self.blocks), dict(self.heights))
+
+    def restore(self):
+        with self.lock:
+            if self.checkpoint is not None:
+                self.blocks, self.heights = dict(self.checkpoint[0]), dict(self.checkpoint[1])
+
+class _Events:
+    """The event queues of one connection"""
+    def __init__(self):
+        self.block = deque()
+        self.chat = deque()
+        self.projectile = deque()
+        self.lock = threading.Lock()
+
+    def add(self, channel, entityId, record):
+        with self.lock:
+            getattr(self, channel).append((entityId, record))
+
+    def take(self, channel, entityId=None):
+        """Remove and format the queued events of a channel, all of them or
+        only those of entityId"""
+        queue = getattr(self, channel)
+        with self.lock:
+            records = [r for id, r in queue if entityId is None or id == entityId]
+            kept = [] if entityId is None else [e for e in queue if e[0] != entityId]
+            queue.clear()
+            queue.extend(kept)
+        return "|".join(records)
+
+    def clear(self, entityId=None):
+        for channel in ("block", "chat", "projectile"):
+            self.take(channel, entityId)
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Runs the commands of one connection"""
+    def setup(self):
+        socketserver.StreamRequestHandler.setup(self)
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.events = self.server.mock._connect(self)
+
+    def finish(self):
+        self.server.mock._disconnect(self)
+        socketserver.StreamRequestHandler.finish(self)
+
+    def handle(self):
+        mock = self.server.mock
+        for line in self.rfile:
+            line = line.rstrip(b"\r\n").decode("UTF-8", "replace")
+            reply = mock.execute(line, self.events)
+            if reply is not None:
+                delay = mock.latency + (random.uniform(0, mock.jitter) if mock.jitter else 0)
+                if delay:
+                    time.sleep(delay)
+                self.wfile.write(reply.encode("UTF-8") + b"\n")
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+class MockServer:
+    """A local RaspberryJuice stand in
+
+    port=0 picks a free port, see the port attribute once started. If no
+    world is given a new MockWorld with a player called "player" is made."""
+    def __init__(self, address="localhost", port=0, world=None, latency=0.0, jitter=0.0):
+        if world is None:
+            world = MockWorld()
+            world.addPlayer("player")
+        self.world = world
+        self.latency = latency
+        self.jitter = jitter
+        self.commands = Counter()
+        self._events = []
+        self._lock = threading.Lock()
+        self._server = _Server((address, port), _Handler, bind_and_activate=True)
+        self._server.mock = self
+        self.address, self.port = self._server.server_address[:2]
+        self._thread = None
+
+    def start(self):
+        """Serve on a daemon thread"""
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        """Stop serving and close the listening socket"""
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _connect(self, handler):
+        events = _Events()
+        with self._lock:
+            self._events.append(events)
+        return events
+
+    def _disconnect(self, handler):
+        with self._lock:
+            self._events.remove(handler.events)
+
+    def _raise(self, channel, entityId, record):
+        with self._lock:
+            for events in self._events:
+                events.add(channel, entityId, record)
+
+    def hitBlock(self, x, y, z, face=1, entityId=None):
+        """Queue a block hit event on every connection"""
+        entityId = self._player(entityId).id
+        self._raise("block", entityId, "%d,%d,%d,%d,%d" % (x, y, z, face, entityId))
+
+    def postChat(self, message, entityId=None):
+        """Queue a chat post event on every connection"""
+        entityId = self._player(entityId).id
+        self._raise("chat", entityId, "%d,%s" % (entityId, message))
+
+    def hitProjectile(self, x, y, z, target="", entityId=None):
+        """Queue a projectile hit event on every connection"""
+        player = self._player(entityId)
+        self._raise("projectile", player.id, "%d,%d,%d,%d,%s,%s" % (x, y, z, player.id, player.name, target))
+
+    def _player(self, id=None):
+        if id is None:
+            players = self.world.players()
+            if not players:
+                raise ValueError("The world has no players")
+            return min(players, key=lambda p: p.id)
+        return self.world.entities[id]
+
+    def execute(self, line, events):
+        """Run one command line => the reply, or None for commands which
+        do not reply"""
+        paren = line.find("(")
+        if paren < 0 or not line.endswith(")"):
+            return "Fail"
+        name = line[:paren]
+        args = line[paren + 1:-1]
+        self.commands[name] += 1
+        command = _commands.get(name)
+        if command is None:
+            return "Fail"
+        try:
+            return command(self, args, events)
+        except (ValueError, IndexError, KeyError, TypeError):
+            return "Fail"
+
+def _ints(args):
+    return [int(float(a)) for a in args.split(",")] if args else []
+
+def _floats(args):
+    return [float(a) for a in args.split(",")] if args else []
+
+def _setBlock(server, args, events):
+    server.world.setBlock(*_ints(args)[:5])
+
+def _setBlocks(server, args, events):
+    server.world.setBlocks(*_ints(args)[:8])
+
+def _getBlock(server, args, events):
+    return str(server.world.getBlock(*_ints(args))[0])
+
+def _getBlockWithData(server, args, events):
+    return "%d,%d" % server.world.getBlock(*_ints(args))
+
+def _getBlocks(server, args, events):
+    return ",".join(map(str, server.world.getBlocks(*_ints(args))))
+
+def _getHeight(server, args, events):
+    return str(server.world.getHeight(*_ints(args)))
+
+def _setSign(server, args, events):
+    a = args.split(",")
+    server.world.setBlock(*[int(v) for v in a[:5]])
+
+def _getPlayerIds(server, args, events):
+    ids = [p.id for p in server.world.players()]
+    if not ids:
+        return "Fail"
+    return "|".join(map(str, sorted(ids)))
+
+def _getPlayerId(server, args, events):
+    for p in server.world.players():
+        if p.name == args:
+            return str(p.id)
+    return "Fail"
+
+def _entityGetName(server, args, events):
+    return server.world.entities[int(args)].name
+
+def _spawnEntity(server, args, events):
+    x, y, z, typeId = _floats(args)[:4]
+    return str(server.world.spawnEntity(x, y, z, int(typeId)))
+
+def _getEntityTypes(server, args, events):
+    return "|".join("%d,%s" % t for t in sorted(_typeNames.items()))
+
+def _worldGetEntities(server, args, events):
+    typeId = int(args) if args else -1
+    world = server.world
+    return "|".join(e.record() for e in list(world.entities.values())
+                    if e.typeId != PlayerTypeId and (typeId == -1 or e.typeId == typeId))
+
+def _worldRemoveEntity(server, args, events):
+    e = server.world.entities.get(int(args))
+    if e is None or e.typeId == PlayerTypeId:
+        return "0"
+    return str(server.world.removeEntities([e]))
+
+def _worldRemoveEntities(server, args, events):
+    typeId = int(args) if args else -1
+    world = server.world
+    return str(world.removeEntities([e for e in list(world.entities.values())
+                                     if e.typeId != PlayerTypeId and (typeId == -1 or e.typeId == typeId)]))
+
+def _setting(server, args, events):
+    key, value = args.split(",")
+    server.world.settings[key] = value == "1"
+
+def _chatPost(server, args, events):
+    server.world.chat.append(args)
+
+def _ignore(server, args, events):
+    pass
+
+def _checkpointSave(server, args, events):
+    server.world.save()
+
+def _checkpointRestore(server, args, events):
+    server.world.restore()
+
+def _eventsClear(server, args, events):
+    events.clear()
+
+def _blockHits(server, args, events):
+    return events.take("block")
+
+def _chatPosts(server, args, events):
+    return events.take("chat")
+
+def _projectileHits(server, args, events):
+    return events.take("projectile")
+
+def _distanceType(args):
+    """(distance, typeId) arguments, defaulting to 10 and -1"""
+    a = _ints(args)
+    return (a + [10, -1][len(a):])[:2]
+
+def _positioner(target):
+    """The commands of the entity or player package. target(server, args)
+    picks the entity and returns it with the remaining arguments."""
+    def getPos(server, args, events):
+        e, _ = target(server, args)
+        return "%s,%s,%s" % (e.x, e.y, e.z)
+
+    def setPos(server, args, events):
+        e, rest = target(server, args)
+        e.x, e.y, e.z = _floats(rest)[:3]
+
+    def getTile(server, args, events):
+        e, _ = target(server, args)
+        return "%d,%d,%d" % (math.floor(e.x), math.floor(e.y), math.floor(e.z))
+
+    def setTile(server, args, events):
+        e, rest = target(server, args)
+        x, y, z = _ints(rest)[:3]
+        e.x, e.y, e.z = x + 0.5, float(y), z + 0.5
+
+    def getRotation(server, args, events):
+        return str(target(server, args)[0].yaw)
+
+    def setRotation(server, args, events):
+        e, rest = target(server, args)
+        e.yaw = float(rest)
+
+    def getPitch(server, args, events):
+        return str(target(server, args)[0].pitch)
+
+    def setPitch(server, args, events):
+        e, rest = target(server, args)
+        e.pitch = float(rest)
+
+    def getDirection(server, args, events):
+        e, _ = target(server, args)
+        yaw, pitch = math.radians(e.yaw), math.radians(e.pitch)
+        return "%s,%s,%s" % (-math.sin(yaw) * math.cos(pitch), -math.sin(pitch), math.cos(yaw) * math.cos(pitch))
+
+    def setDirection(server, args, events):
+        e, rest = target(server, args)
+        x, y, z = _floats(rest)[:3]
+        e.yaw = math.degrees(math.atan2(-x, z))
+        e.pitch = math.degrees(math.atan2(-y, math.sqrt(x * x + z * z)))
+
+    def getEntities(server, args, events):
+        e, rest = target(server, args)
+        distance, typeId = _distanceType(rest)
+        return "|".join(o.record() for o in server.world.entitiesNear(e.x, e.y, e.z, distance, typeId))
+
+    def removeEntities(server, args, events):
+        e, rest = target(server, args)
+        distance, typeId = _distanceType(rest)
+        return str(server.world.removeEntities(server.world.entitiesNear(e.x, e.y, e.z, distance, typeId)))
+
+    def blockHits(server, args, events):
+        return events.take("block", target(server, args)[0].id)
+
+    def chatPosts(server, args, events):
+        return events.take("chat", target(server, args)[0].id)
+
+    def projectileHits(server, args, events):
+        return events.take("projectile", target(server, args)[0].id)
+
+    def clear(server, args, events):
+        events.clear(target(server, args)[0].id)
+
+    return {
+        "getPos": getPos, "setPos": setPos, "getTile": getTile, "setTile": setTile,
+        "getRotation": getRotation, "setRotation": setRotation,
+        "getPitch": getPitch, "setPitch": setPitch,
+        "getDirection": getDirection, "setDirection": setDirection,
+        "getEntities": getEntities, "removeEntities": removeEntities,
+        "events.block.hits": blockHits, "events.chat.posts": chatPosts,
+        "events.projectile.hits": projectileHits, "events.clear": clear,
+        "setting": _ignore,
+    }
+
+def _entityTarget(server, args):
+    id, _, rest = args.partition(",")
+    return server.world.entities[int(id)], rest
+
+def _playerTarget(server, args):
+    return server._player(), args
+
+_commands = {
+    "world.setBlock": _setBlock,
+    "world.setBlocks": _setBlocks,
+    "world.getBlock": _getBlock,
+    "world.getBlockWithData": _getBlockWithData,
+    "world.getBlocks": _getBlocks,
+    "world.getHeight": _getHeight,
+    "world.setSign": _setSign,
+    "world.getPlayerIds": _getPlayerIds,
+    "world.getPlayerId": _getPlayerId,
+    "world.spawnEntity": _spawnEntity,
+    "entity.getName": _entityGetName,
+    "world.getEntityTypes": _getEntityTypes,
+    "world.getEntities": _worldGetEntities,
+    "world.removeEntity": _worldRemoveEntity,
+    "world.removeEntities": _worldRemoveEntities,
+    "world.setting": _setting,
+    "world.checkpoint.save": _checkpointSave,
+    "world.checkpoint.restore": _checkpointRestore,
+    "chat.post": _chatPost,
+    "events.clear": _eventsClear,
+    "events.block.hits": _blockHits,
+    "events.chat.posts": _chatPosts,
+    "events.projectile.hits": _projectileHits,
+    "camera.mode.setNormal": _ignore,
+    "camera.mode.setFixed": _ignore,
+    "camera.mode.setFollow": _ignore,
+    "camera.setPos": _ignore,
+}
+for _package, _target in (("entity", _entityTarget), ("player", _playerTarget)):
+    for _name, _command in _positioner(_target).items():
+        _commands[_package + "." + _name] = _command
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a mock RaspberryJuice world")
+    parser.add_argument("--address", default="localhost")
+    parser.add_argument("--port", type=int, default=4711)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added before every reply")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many more seconds, at random")
+    parser.add_argument("--ground", type=int, default=0, help="height below which the world is stone")
+    options = parser.parse_args(argv)
+    world = MockWorld(groundHeight=options.ground)
+    world.addPlayer("player")
+    server = MockServer(options.address, options.port, world, options.latency, options.jitter)
+    print("Serving on %s:%d" % (server.address, server.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from array import array
+from .entity import EntityInfo, EntityColumns
+from .event import BlockEvent, ChatEvent, ProjectileEvent
+
+""" Parsers for the replies to the list commands (getEntities and the event
+    polls), shared by Minecraft and AsyncMinecraft.
+
+    Records are separated by "|" and their fields by ",". Apart from chat
+    posts, whose message can contain commas, the records are joined and
+    split in one go and the fields picked out by stride, so each reply is
+    only split once however many records it holds."""
+
+def _fields(s, count):
+    """Split a reply of records of count fields => [field]"""
+    records = [r for r in s.split("|") if r]
+    if not records:
+        return []
+    fields = ",".join(records).split(",")
+    if len(fields) != count * len(records):
+        # some record has extra fields, only the first count of each are used
+        fields = []
+        for r in records:
+            r = r.split(",")
+            if len(r) < count:
+                raise ValueError("Malformed reply: %s"%s)
+            fields.extend(r[:count])
+    return fields
+
+def parseEntities(s):
+    """Parse a getEntities reply => [EntityInfo]"""
+    f = _fields(s, 6)
+    return list(map(EntityInfo,
+        map(int, f[0::6]), map(int, f[1::6]), f[2::6],
+        map(float, f[3::6]), map(float, f[4::6]), map(float, f[5::6])))
+
+def parseEntityColumns(s):
+    """Parse a getEntities reply => EntityColumns"""
+    f = _fields(s, 6)
+    return EntityColumns(
+        array("l", map(int, f[0::6])), array("l", map(int, f[1::6])), f[2::6],
+        array("d", map(float, f[3::6])), array("d", map(float, f[4::6])), array("d", map(float, f[5::6])))
+
+def parseBlockHits(s):
+    """Parse a block hits reply => [BlockEvent]"""
+    f = list(map(int, _fields(s, 5)))
+    return [BlockEvent.Hit(*f[i:i + 5]) for i in range(0, len(f), 5)]
+
+def parseChatPosts(s):
+    """Parse a chat posts reply => [ChatEvent]"""
+    events = [e for e in s.split("|") if e]
+    return [ChatEvent.Post(int(e[:e.find(",")]), e[e.find(",") + 1:]) for e in events]
+
+def parseProjectileHits(s):
+    """Parse a projectile hits reply => [ProjectileEvent]"""
+    f = _fields(s, 6)
+    return list(map(ProjectileEvent.Hit,
+        map(int, f[0::6]), map(int, f[1::6]), map(int, f[2::6]), map(int, f[3::6]),
+        f[4::6], f[5::6]))
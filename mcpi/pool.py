@@ -0,0 +1,151 @@
+import itertools
+import threading
+from .connection import Connection
+from .minecraft import Minecraft, intFloor
+
+""" A pool of connections to the same game, for spreading independent
+    commands over several sockets so the server processes them in parallel.
+
+        pool = ConnectionPool("localhost", 4711, size=4)
+        mc = pool.minecraft()
+        mc.setBlock(0, 0, 0, 1)
+        pool.setBlocks(0, 0, 0, 99, 20, 99, 1)
+        pool.close()
+
+    Thread safety: ConnectionPool and the Minecraft returned by
+    pool.minecraft() can be used from many threads at once. Each call runs
+    on one connection, which is locked for the duration of the call, and
+    consecutive calls go to different connections. Because of that, calls
+    are only ordered with respect to other calls on the same connection, so
+    only use the pool for commands which do not depend on each other."""
+
+def splitRegion(x0, y0, z0, x1, y1, z1, parts, axis=None):
+    """Split a cuboid into at most parts slabs along an axis (0=x, 1=y, 2=z)
+    => [(x0,y0,z0,x1,y1,z1)]
+
+    The longest axis is used if none is given. Slabs are returned in
+    ascending order along the axis."""
+    lo = [min(x0, x1), min(y0, y1), min(z0, z1)]
+    hi = [max(x0, x1), max(y0, y1), max(z0, z1)]
+    if axis is None:
+        axis = max(range(3), key=lambda a: hi[a] - lo[a])
+    length = hi[axis] - lo[axis] + 1
+    parts = max(1, min(parts, length))
+    slabs = []
+    start = lo[axis]
+    for i in range(parts):
+        end = start + length // parts + (1 if i < length % parts else 0) - 1
+        a, b = list(lo), list(hi)
+        a[axis], b[axis] = start, end
+        slabs.append(tuple(a + b))
+        start = end + 1
+    return slabs
+
+class ConnectionPool:
+    """A number of connections to the same Minecraft Pi game
+
+    ConnectionPool has the same send/sendReceive methods as Connection so it
+    can be handed to Minecraft in place of a single connection."""
+
+    def __init__(self, address="localhost", port=4711, size=4, **kwargs):
+        self.connections = [Connection(address, port, **kwargs) for _ in range(size)]
+        self._locks = [threading.Lock() for _ in self.connections]
+        self._next = itertools.count()
+
+    def __len__(self):
+        return len(self.connections)
+
+    def _pick(self):
+        i = next(self._next) % len(self.connections)
+        return self.connections[i], self._locks[i]
+
+    def send(self, f, *data):
+        conn, lock = self._pick()
+        with lock:
+            conn.send(f, *data)
+
+    def sendReceive(self, *data):
+        conn, lock = self._pick()
+        with lock:
+            return conn.sendReceive(*data)
+
+    def sendReceiveBytes(self, *data):
+        conn, lock = self._pick()
+        with lock:
+            return conn.sendReceiveBytes(*data)
+
+    def minecraft(self):
+        """Returns a Minecraft which spreads its calls over the pool"""
+        return Minecraft(self)
+
+    def run(self, func, argsList):
+        """Call func(mc, *args) for each args in argsList, each on its own
+        connection and thread => [result] in the order of argsList
+
+        At most one call runs on each connection at a time. If any call
+        raises, the first exception is raised once all calls have finished."""
+        argsList = list(argsList)
+        results = [None] * len(argsList)
+        errors = []
+
+        def worker(index):
+            i = index
+            while i < len(argsList):
+                try:
+                    with self._locks[index]:
+                        results[i] = func(Minecraft(self.connections[index]), *argsList[i])
+                except Exception as e:
+                    errors.append(e)
+                i += len(self.connections)
+
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(min(len(self.connections), len(argsList)))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+        return results
+
+    def sendReceiveMany(self, commands):
+        """Pipelines many requests, split evenly over the pool => [str]
+
+        See Connection.sendReceiveMany"""
+        commands = list(commands)
+        size = len(self.connections)
+        chunks = [(commands[i::size],) for i in range(size)]
+        replies = self.run(lambda mc, chunk: mc.conn.sendReceiveMany(chunk), chunks)
+        results = [None] * len(commands)
+        for i, chunk in enumerate(replies):
+            results[i::size] = chunk
+        return results
+
+    def setBlocks(self, *args):
+        """Set a cuboid of blocks (x0,y0,z0,x1,y1,z1,id,[data]) using every
+        connection, each setting one slab of the cuboid"""
+        args = intFloor(args)
+        slabs = splitRegion(*(args[:6] + [len(self.connections)]))
+        self.run(lambda mc, *slab: mc.setBlocks(slab, args[6:]), slabs)
+
+    def getBlocks(self, *args):
+        """Get a cuboid of blocks (x0,y0,z0,x1,y1,z1) using every connection
+        => [id:int] in the same order as Minecraft.getBlocks"""
+        args = intFloor(args)
+        # getBlocks replies are ordered y first, so slabs split along y can
+        # simply be joined back together
+        slabs = splitRegion(*(args[:6] + [len(self.connections), 1]))
+        parts = self.run(lambda mc, *slab: list(mc.getBlocks(slab)), slabs)
+        return [b for part in parts for b in part]
+
+    def close(self):
+        """Flush and close every connection"""
+        for conn, lock in zip(self.connections, self._locks):
+            with lock:
+                conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,140 @@
+from array import array
+from collections import deque
+from .vec3 import Vec3
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+""" Compact containers and parsers for world.getBlocks replies.
+
+    A cuboid of blocks is held as a flat array indexed [y][x][z], with z
+    changing fastest, which is the order the server sends them in. The
+    matching NumPy shape is (height, width, depth).
+
+    Large cuboids can be read tile by tile with iterRegion, which keeps a
+    few world.getBlocks requests in flight and yields tiles as they arrive:
+
+        for origin, tile in iterRegion(mc, 0, 0, 0, 511, 127, 511):
+            counts[origin.x, origin.z] = sum(1 for b in tile if b == 56)
+"""
+
+ParseWindow = 1 << 16
+
+def cuboid(x0, y0, z0, x1, y1, z1):
+    """Normalise two corners => (origin:Vec3, shape:(height,width,depth))"""
+    origin = Vec3(min(x0, x1), min(y0, y1), min(z0, z1))
+    shape = (abs(y1 - y0) + 1, abs(x1 - x0) + 1, abs(z1 - z0) + 1)
+    return origin, shape
+
+def parseIds(s, typecode="H"):
+    """Parse a comma separated reply of ints straight into an array
+
+    The reply is parsed a window at a time so only a bounded number of
+    substrings exist at once, however large the reply is."""
+    result = array(typecode)
+    if not s:
+        return result
+    start = 0
+    end = len(s)
+    while start < end:
+        stop = start + ParseWindow
+        if stop >= end:
+            stop = end
+        else:
+            stop = s.find(b",", stop)
+            if stop < 0:
+                stop = end
+        result.extend(map(int, s[start:stop].split(b",")))
+        start = stop + 1
+    return result
+
+def parseIdsNumpy(s, shape=None, dtype="uint16"):
+    """Parse a comma separated reply of ints into a NumPy array of shape"""
+    if numpy is None:
+        raise ImportError("numpy is required for parseIdsNumpy")
+    result = numpy.fromstring(s, dtype=dtype, sep=",")
+    if shape is not None:
+        result = result.reshape(shape)
+    return result
+
+class BlockRegion:
+    """A cuboid of block ids read from the world
+
+    blocks is an array('H') indexed [y][x][z] relative to origin, see
+    index()."""
+    def __init__(self, origin, shape, blocks):
+        self.origin = origin
+        self.shape = shape
+        self.blocks = blocks
+        if len(blocks) != shape[0] * shape[1] * shape[2]:
+            raise ValueError("%d blocks do not fit shape %s"%(len(blocks), shape))
+
+    def index(self, x, y, z):
+        """The position of world block (x,y,z) in blocks"""
+        _, sx, sz = self.shape
+        return ((y - self.origin.y) * sx + (x - self.origin.x)) * sz + (z - self.origin.z)
+
+    def contains(self, x, y, z):
+        """True if world block (x,y,z) is inside the region"""
+        sy, sx, sz = self.shape
+        o = self.origin
+        return (0 <= x - o.x < sx) and (0 <= y - o.y < sy) and (0 <= z - o.z < sz)
+
+    def get(self, x, y, z):
+        """Get the id of world block (x,y,z) => id:int"""
+        if not self.contains(x, y, z):
+            raise IndexError("(%s,%s,%s) is outside the region"%(x, y, z))
+        return self.blocks[self.index(x, y, z)]
+
+    def toNumpy(self):
+        """A NumPy view of blocks with shape (height, width, depth)"""
+        if numpy is None:
+            raise ImportError("numpy is required for toNumpy")
+        return numpy.frombuffer(self.blocks, dtype=numpy.uint16).reshape(self.shape)
+
+    def __len__(self):
+        return len(self.blocks)
+
+    def __iter__(self):
+        return iter(self.blocks)
+
+    def __repr__(self):
+        return "BlockRegion(%s, %s)"%(self.origin, self.shape)
+
+def iterTiles(x0, y0, z0, x1, y1, z1, tileShape=(16, 16, 16)):
+    """Split a cuboid into tiles of at most tileShape (height, width, depth)
+    => generator of (x0,y0,z0,x1,y1,z1), in y, x, z order"""
+    origin, shape = cuboid(x0, y0, z0, x1, y1, z1)
+    ty, tx, tz = tileShape
+    sy, sx, sz = shape
+    for y in range(origin.y, origin.y + sy, ty):
+        for x in range(origin.x, origin.x + sx, tx):
+            for z in range(origin.z, origin.z + sz, tz):
+                yield (x, y, z,
+                       min(x + tx, origin.x + sx) - 1,
+                       min(y + ty, origin.y + sy) - 1,
+                       min(z + tz, origin.z + sz) - 1)
+
+def iterRegion(mc, x0, y0, z0, x1, y1, z1, tileShape=(16, 16, 16), inFlight=4):
+    """Read a large cuboid of blocks tile by tile
+    => generator of (origin:Vec3, BlockRegion)
+
+    Up to inFlight world.getBlocks requests are pipelined on mc.conn, so
+    only that many tiles are held in memory and the next tiles are on their
+    way while the current one is processed. The connection should not be
+    used for anything else until the generator is finished or closed."""
+    pending = deque()
+
+    def tileRegion(tile, reply):
+        origin, shape = cuboid(*tile)
+        return origin, BlockRegion(origin, shape, parseIds(reply.resultBytes()))
+
+    with mc.conn.pipeline() as pipe:
+        for tile in iterTiles(x0, y0, z0, x1, y1, z1, tileShape):
+            pending.append((tile, pipe.sendReceive(b"world.getBlocks", tile)))
+            if len(pending) >= inFlight:
+                yield tileRegion(*pending.popleft())
+        while pending:
+            yield tileRegion(*pending.popleft())
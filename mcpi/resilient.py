@@ -0,0 +1,192 @@
+import logging
+import socket
+import time
+from collections import deque
+from .connection import Connection, RequestError, _encodeCommand
+from .minecraft import Minecraft
+
+""" A Connection which survives the game dropping the link.
+
+        conn = ResilientConnection("192.168.1.10", 4711, timeout=30,
+                                   onProgress=lambda c: save(c.confirmed))
+        mc = Minecraft(conn)
+        build(mc)
+
+    When a send or receive fails, or a reply takes longer than timeout
+    seconds, the connection is reopened, waiting backoff seconds before the
+    first attempt and doubling up to maxBackoff, for up to retries attempts.
+
+    The server runs commands in order, so every reply confirms everything
+    sent before its request. Block writes (world.setBlock, world.setBlocks
+    and world.setSign) sent since the last reply are kept in a journal and
+    replayed on the new link. Setting the same block twice does no harm, so
+    a write can be replayed even if it had already arrived. Other commands
+    without a reply, e.g. chat.post or world.setting, are not replayed; those
+    sent since the last reply are counted in lost as they may or may not
+    have arrived. A request interrupted by a failure is sent again if it
+    only reads (see Rereadable), otherwise the failure is raised once the
+    link is back, as it is after retries attempts. Pipelines are not
+    recovered; a failure while replies are outstanding is raised.
+
+    So that the journal stays short during long runs of writes, a cheap
+    request is made every syncEvery writes to confirm them. onProgress(conn)
+    is called whenever writes are confirmed. To resume a build that was
+    interrupted, run it again with resumeAfter set to the last confirmed
+    count: that many block writes are then skipped.
+
+    While the link is healthy the only extra cost is the journal append for
+    each block write."""
+
+log = logging.getLogger(__name__)
+
+ReplayableWrites = frozenset([b"world.setBlock", b"world.setBlocks", b"world.setSign"])
+
+def _unjournaled(s):
+    """The commands of s which are not block writes, and so not journaled"""
+    lines = bytes(s).split(b"\n")[:-1]
+    return b"".join(line + b"\n" for line in lines
+                    if line[:line.find(b"(")] not in ReplayableWrites)
+
+def Rereadable(f):
+    """Whether request f can safely be sent twice"""
+    return b".get" in f or b".events." in f or f.startswith(b"events.")
+
+class ResilientConnection(Connection):
+    """Connection with reconnect, replay of block writes and a receive timeout"""
+    SyncCommand = (b"world.getBlock", 0, 0, 0)
+
+    def __init__(self, address, port, timeout=None, retries=8, backoff=0.5, maxBackoff=30.0,
+                 syncEvery=1000, onProgress=None, onReconnect=None, resumeAfter=0, **kwargs):
+        Connection.__init__(self, address, port, **kwargs)
+        self.address = address
+        self.port = port
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.syncEvery = syncEvery
+        self.onProgress = onProgress
+        self.onReconnect = onReconnect
+        self.resumeAfter = resumeAfter
+        self.writes = 0
+        self.confirmed = 0
+        self.reconnects = 0
+        self.replayed = 0
+        self.lost = 0
+        self._journal = deque()
+        self._unconfirmed = 0
+        self._inRequest = False
+        self.socket.settimeout(timeout)
+
+    @staticmethod
+    def minecraft(address="localhost", port=4711, **kwargs):
+        """Connect to a game => Minecraft using a ResilientConnection"""
+        return Minecraft(ResilientConnection(address, port, **kwargs))
+
+    def _encode(self, f, data):
+        s = _encodeCommand(f, data)
+        if f in ReplayableWrites:
+            self.writes += 1
+            if self.writes <= self.resumeAfter:
+                # confirmed before the build was interrupted
+                self.confirmed = self.writes
+                return b""
+            self._journal.append(s)
+        return s
+
+    def send(self, f, *data):
+        Connection.send(self, f, *data)
+        if self._inRequest:
+            return
+        if f not in ReplayableWrites:
+            self._unconfirmed += 1
+        if len(self._journal) >= self.syncEvery and not self._outstanding and not self._batchDepth:
+            self.sync()
+
+    def sync(self):
+        """Wait for the server to confirm everything sent so far"""
+        self.sendReceiveBytes(*ResilientConnection.SyncCommand)
+
+    def _write(self, s):
+        try:
+            Connection._write(self, s)
+        except socket.error as e:
+            # the block writes in s are in the journal, which _recover
+            # replays, so only the rest of s is sent again
+            self._recover(e, _unjournaled(s))
+
+    def receiveBytes(self):
+        try:
+            reply = Connection.receiveBytes(self)
+        except RequestError:
+            # a failed request still confirms what came before it
+            self._confirm()
+            raise
+        self._confirm()
+        return reply
+
+    def sendReceiveBytes(self, *data):
+        for attempt in range(1, self.retries + 1):
+            self._inRequest = True
+            try:
+                return Connection.sendReceiveBytes(self, *data)
+            except socket.error as e:
+                self._recover(e)
+                if not Rereadable(data[0]) or attempt == self.retries:
+                    raise
+            finally:
+                self._inRequest = False
+
+    def _confirm(self):
+        if self._outstanding:
+            return
+        if self._journal:
+            self.confirmed += len(self._journal)
+            self._journal.clear()
+            if self.onProgress is not None:
+                self.onProgress(self)
+        self._unconfirmed = 0
+
+    def _recover(self, error, resend=b""):
+        """Reopen the link after error, replay the journal and send resend"""
+        if self._outstanding:
+            raise error
+        log.warning("Connection to %s:%d lost (%s), reconnecting", self.address, self.port, error)
+        replay = b"".join(self._journal) + resend
+        delay = self.backoff
+        for attempt in range(1, self.retries + 1):
+            try:
+                self.socket.close()
+            except socket.error:
+                pass
+            try:
+                self.socket = socket.create_connection((self.address, self.port), self.timeout)
+                self.socket.settimeout(self.timeout)
+                if replay:
+                    self.socket.sendall(replay)
+                break
+            except socket.error:
+                if attempt == self.retries:
+                    raise error
+                log.info("Reconnect attempt %d failed, retrying in %.1fs", attempt, delay)
+                time.sleep(delay)
+                delay = min(delay * 2, self.maxBackoff)
+        del self._rbuf[:]
+        self.reconnects += 1
+        self.lost += self._unconfirmed
+        self._unconfirmed = 0
+        self.replayed += len(self._journal)
+        log.warning("Reconnected to %s:%d, replayed %d block writes", self.address, self.port, len(self._journal))
+        if self.onReconnect is not None:
+            self.onReconnect(self)
+
+    def progress(self):
+        """The counters as a dict"""
+        return {
+            "writes": self.writes,
+            "confirmed": self.confirmed,
+            "pending": len(self._journal),
+            "reconnects": self.reconnects,
+            "replayed": self.replayed,
+            "lost": self.lost,
+        }
@@ -0,0 +1,313 @@
+import gzip
+import mmap
+import struct
+import sys
+from array import array
+from . import block
+from .minecraft import intFloor
+from .region import cuboid, iterRegion
+from .voxel import mergeBoxes, sendBoxes
+
+""" A compact binary format for moving regions between worlds, and readers
+    for the MCEdit .schematic and Sponge .schem formats.
+
+        exportRegion(mc, "arena.mcr", 0, 0, 0, 99, 30, 99)
+        with Schematic.open("arena.mcr") as s:
+            importSchematic(other, s, (500, 0, 500))
+
+    The .mcr layout is a header followed by the planes, little endian:
+
+        magic    8 bytes  b"MCPIREG\\x01"
+        height   uint32   y size
+        width    uint32   x size
+        depth    uint32   z size
+        flags    uint32   1 = data plane present
+        reserved 12 bytes
+        ids      uint16 * height * width * depth, indexed [y][x][z]
+        data     uint8  * height * width * depth, if flags & 1
+
+    Schematic.open maps the file with mmap, so the planes are read straight
+    from the page cache rather than decoded into Python objects."""
+
+Magic = b"MCPIREG\x01"
+Header = struct.Struct("<8sIIII12x")
+HasData = 1
+
+class Schematic:
+    """A region of block ids and optional data values, indexed [y][x][z]
+
+    ids and data are any buffers of uint16 and uint8 values, e.g. arrays
+    or memoryviews into a mapped file."""
+    def __init__(self, shape, ids, data=None):
+        self.shape = tuple(shape)
+        self.ids = ids
+        self.data = data
+        self._file = None
+        self._mmap = None
+        self._view = None
+        if len(ids) != self.volume:
+            raise ValueError("%d ids do not fit shape %s"%(len(ids), shape))
+
+    @property
+    def volume(self):
+        sy, sx, sz = self.shape
+        return sy * sx * sz
+
+    def index(self, x, y, z):
+        """The position of local block (x,y,z) in ids and data"""
+        _, sx, sz = self.shape
+        return (y * sx + x) * sz + z
+
+    def get(self, x, y, z):
+        """Get local block (x,y,z) => Block"""
+        i = self.index(x, y, z)
+        return block.Block(self.ids[i], self.data[i] if self.data is not None else 0)
+
+    @staticmethod
+    def open(path):
+        """Map a .mcr file => Schematic, which should be closed when done"""
+        f = open(path, "rb")
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+        view = ids = data = None
+        try:
+            magic, sy, sx, sz, flags = Header.unpack_from(m, 0)
+            if magic != Magic:
+                raise ValueError("%s is not an mcpi region file"%path)
+            n = sy * sx * sz
+            view = memoryview(m)
+            ids = view[Header.size:Header.size + 2 * n].cast("H")
+            data = view[Header.size + 2 * n:Header.size + 3 * n] if flags & HasData else None
+            if sys.byteorder != "little":
+                ids = array("H", ids)
+                ids.byteswap()
+            s = Schematic((sy, sx, sz), ids, data)
+        except Exception:
+            # e.g. a truncated file, the views must go before the map
+            for v in (ids, data, view):
+                if isinstance(v, memoryview):
+                    v.release()
+            m.close()
+            f.close()
+            raise
+        s._file, s._mmap, s._view = f, m, view
+        return s
+
+    def save(self, path):
+        """Write as a .mcr file"""
+        with open(path, "wb") as f:
+            f.write(Header.pack(Magic, self.shape[0], self.shape[1], self.shape[2],
+                                HasData if self.data is not None else 0))
+            ids = array("H", self.ids)
+            if sys.byteorder != "little":
+                ids.byteswap()
+            ids.tofile(f)
+            if self.data is not None:
+                f.write(bytes(bytearray(self.data)))
+
+    def close(self):
+        """Release the mapped file, if any"""
+        if self._mmap is not None:
+            if isinstance(self.ids, memoryview):
+                self.ids.release()
+            if isinstance(self.data, memoryview):
+                self.data.release()
+            self._view.release()
+            self.ids = self.data = self._view = None
+            self._mmap.close()
+            self._file.close()
+            self._mmap = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __repr__(self):
+        return "Schematic(%s)"%(self.shape,)
+
+def exportRegion(mc, path, x0, y0, z0, x1, y1, z1, tileShape=(16, 16, 16), inFlight=4):
+    """Read a cuboid of the world tile by tile straight into a .mcr file
+
+    Only block ids are exported, world.getBlocks does not return data."""
+    x0, y0, z0, x1, y1, z1 = intFloor(x0, y0, z0, x1, y1, z1)
+    origin, shape = cuboid(x0, y0, z0, x1, y1, z1)
+    sy, sx, sz = shape
+    n = sy * sx * sz
+    with open(path, "w+b") as f:
+        f.write(Header.pack(Magic, sy, sx, sz, 0))
+        f.truncate(Header.size + 2 * n)
+        m = mmap.mmap(f.fileno(), Header.size + 2 * n)
+        try:
+            ids = memoryview(m)[Header.size:].cast("H")
+            try:
+                for tileOrigin, tile in iterRegion(mc, x0, y0, z0, x1, y1, z1, tileShape, inFlight):
+                    ty, tx, tz = tile.shape
+                    blocks = tile.blocks
+                    if sys.byteorder != "little":
+                        blocks.byteswap()
+                    for y in range(ty):
+                        for x in range(tx):
+                            i = ((tileOrigin.y - origin.y + y) * sx + (tileOrigin.x - origin.x + x)) * sz + (tileOrigin.z - origin.z)
+                            j = (y * tx + x) * tz
+                            ids[i:i + tz] = blocks[j:j + tz]
+            finally:
+                # m cannot be closed while a view of it is alive
+                ids.release()
+            m.flush()
+        finally:
+            m.close()
+
+def importSchematic(mc, schematic, origin, skip=None, slab=16):
+    """Write a Schematic (or the path of a .mcr file) into the world at
+    origin (x,y,z) as merged setBlocks cuboids => commands sent
+
+    The schematic is merged slab layers at a time, so only one slab is
+    decoded at once. skip is passed to mergeBoxes, e.g. skip=0 to leave
+    air alone."""
+    if not isinstance(schematic, Schematic):
+        with Schematic.open(schematic) as s:
+            return importSchematic(mc, s, origin, skip, slab)
+    ox, oy, oz = intFloor(origin)
+    sy, sx, sz = schematic.shape
+    layer = sx * sz
+    sent = 0
+    for y in range(0, sy, slab):
+        h = min(slab, sy - y)
+        ids = schematic.ids[y * layer:(y + h) * layer]
+        data = schematic.data[y * layer:(y + h) * layer] if schematic.data is not None else None
+        boxes = mergeBoxes(ids, (h, sx, sz), data=data, skip=skip)
+        sent += sendBoxes(mc, (ox, oy + y, oz), boxes, withData=data is not None)
+    return sent
+
+# NBT, as used by the .schematic and .schem formats
+
+def _readNbt(buf, pos, tagType):
+    """Read an NBT payload of tagType at pos => (value, pos)"""
+    if tagType == 1:
+        return struct.unpack_from(">b", buf, pos)[0], pos + 1
+    if tagType == 2:
+        return struct.unpack_from(">h", buf, pos)[0], pos + 2
+    if tagType == 3:
+        return struct.unpack_from(">i", buf, pos)[0], pos + 4
+    if tagType == 4:
+        return struct.unpack_from(">q", buf, pos)[0], pos + 8
+    if tagType == 5:
+        return struct.unpack_from(">f", buf, pos)[0], pos + 4
+    if tagType == 6:
+        return struct.unpack_from(">d", buf, pos)[0], pos + 8
+    if tagType == 7:
+        n = struct.unpack_from(">i", buf, pos)[0]
+        return buf[pos + 4:pos + 4 + n], pos + 4 + n
+    if tagType == 8:
+        n = struct.unpack_from(">H", buf, pos)[0]
+        return buf[pos + 2:pos + 2 + n].decode("UTF-8"), pos + 2 + n
+    if tagType == 9:
+        itemType, n = struct.unpack_from(">bi", buf, pos)
+        pos += 5
+        items = []
+        for _ in range(n):
+            item, pos = _readNbt(buf, pos, itemType)
+            items.append(item)
+        return items, pos
+    if tagType == 10:
+        compound = {}
+        while True:
+            childType = struct.unpack_from(">b", buf, pos)[0]
+            pos += 1
+            if childType == 0:
+                return compound, pos
+            n = struct.unpack_from(">H", buf, pos)[0]
+            name = buf[pos + 2:pos + 2 + n].decode("UTF-8")
+            compound[name], pos = _readNbt(buf, pos + 2 + n, childType)
+    if tagType == 11:
+        n = struct.unpack_from(">i", buf, pos)[0]
+        return array("i", struct.unpack_from(">%di" % n, buf, pos + 4)), pos + 4 + 4 * n
+    if tagType == 12:
+        n = struct.unpack_from(">i", buf, pos)[0]
+        return array("q", struct.unpack_from(">%dq" % n, buf, pos + 4)), pos + 4 + 8 * n
+    raise ValueError("Unknown NBT tag type %d"%tagType)
+
+def readNbt(path):
+    """Read a gzipped NBT file => (rootName, {compound})"""
+    with gzip.open(path, "rb") as f:
+        buf = f.read()
+    if struct.unpack_from(">b", buf, 0)[0] != 10:
+        raise ValueError("%s does not hold an NBT compound"%path)
+    n = struct.unpack_from(">H", buf, 1)[0]
+    root, _ = _readNbt(buf, 3 + n, 10)
+    return buf[3:3 + n].decode("UTF-8"), root
+
+def _fromYZX(values, sy, sx, sz, typecode):
+    """Reorder a [y][z][x] plane to [y][x][z]"""
+    out = array(typecode, [0]) * (sy * sx * sz)
+    for y in range(sy):
+        for z in range(sz):
+            row = values[(y * sz + z) * sx:(y * sz + z + 1) * sx]
+            base = y * sx * sz + z
+            out[base:base + sx * sz:sz] = array(typecode, list(row))
+    return out
+
+def readClassicSchematic(path):
+    """Read an MCEdit .schematic file => Schematic"""
+    _, root = readNbt(path)
+    sx, sy, sz = root["Width"], root["Height"], root["Length"]
+    ids = bytearray(root["Blocks"])
+    if "AddBlocks" in root:
+        # the high 4 bits of each id, two ids to a byte
+        add = bytearray(root["AddBlocks"])
+        ids = [b | (((add[i >> 1] >> 4) if i & 1 == 0 else (add[i >> 1] & 0xf)) << 8)
+               for i, b in enumerate(ids)]
+    data = bytearray(root["Data"]) if "Data" in root else None
+    return Schematic((sy, sx, sz), _fromYZX(ids, sy, sx, sz, "H"),
+                     _fromYZX(data, sy, sx, sz, "B") if data is not None else None)
+
+def _legacyId(name):
+    """Best guess of the legacy id of a namespaced block state name"""
+    base = name.split("[")[0].split(":")[-1].upper()
+    b = getattr(block, base, None)
+    return b.id if isinstance(b, block.Block) else None
+
+def readSpongeSchematic(path, palette=None, unknown=block.STONE.id):
+    """Read a Sponge .schem file (versions 1 to 3) => Schematic
+
+    Block states are mapped to legacy ids by their name where mcpi.block
+    has a block of that name. Pass palette, a {blockStateName: id} dict,
+    to map others. Anything still unknown becomes the unknown id."""
+    _, root = readNbt(path)
+    if "Schematic" in root:
+        # version 3 nests everything under a Schematic compound
+        root = root["Schematic"]
+    if "Blocks" in root and isinstance(root["Blocks"], dict):
+        states = root["Blocks"]["Palette"]
+        blockData = root["Blocks"]["Data"]
+    else:
+        states = root["Palette"]
+        blockData = root["BlockData"]
+    sx, sy, sz = root["Width"], root["Height"], root["Length"]
+    palette = palette or {}
+    ids = {}
+    for name, index in states.items():
+        id = palette.get(name)
+        if id is None:
+            id = _legacyId(name)
+        ids[index] = unknown if id is None else id
+    values = []
+    buf = bytearray(blockData)
+    i = 0
+    while i < len(buf):
+        # unsigned varints
+        value, shift = 0, 0
+        while True:
+            b = buf[i]
+            i += 1
+            value |= (b & 0x7f) << shift
+            if not b & 0x80:
+                break
+            shift += 7
+        values.append(ids.get(value, unknown))
+    return Schematic((sy, sx, sz), _fromYZX(values, sy, sx, sz, "H"))
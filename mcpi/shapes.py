@@ -0,0 +1,230 @@
+import math
+from .block import Block
+from .editsession import writeBlocks
+from .minecraft import intFloor
+from .vec3 import Vec3
+from .voxel import mergeBoxes, sendBoxes
+
+""" Lines, spheres, cylinders and extruded polygons drawn with merged
+    world.setBlocks cuboids instead of one world.setBlock per block.
+
+        drawSphere(mc, Vec3(0, 80, 0), 40, block.GLASS)         # 576 commands
+        drawLine(mc, Vec3(0, 70, 0), Vec3(30, 90, -12), block.GOLD_BLOCK)
+        drawPolygon(mc, [Vec3(0, 64, 0), Vec3(20, 64, 5), Vec3(8, 64, 25)], 10, block.STONE)
+
+    Spheres and cylinders are rasterized as a set of cuboids centred on the
+    shape which overlap each other, one for each corner of the staircase
+    the shape's surface makes, so a radius 40 sphere is a few hundred
+    commands rather than a few hundred thousand blocks. Lines are sent as
+    runs along an axis and polygons as rectangles merged by mergeBoxes.
+    Shapes which cannot be covered that way, e.g. a hollow shell with its
+    inside left as it is, are merged over their bounding box.
+
+    The *Boxes functions return the cuboids, as (x0,y0,z0,x1,y1,z1)
+    tuples, without sending anything. The draw functions send them and
+    return the number of commands sent."""
+
+def _isqrt(n):
+    """floor(sqrt(n)) for n >= 0"""
+    r = int(n ** 0.5)
+    while r * r > n:
+        r -= 1
+    while (r + 1) * (r + 1) <= n:
+        r += 1
+    return r
+
+def _blockKey(block):
+    """A Block or id => (id, data, withData)"""
+    if isinstance(block, Block):
+        return block.id, block.data, True
+    return int(block), 0, False
+
+def _send(mc, boxes, block):
+    """Send (x0,y0,z0,x1,y1,z1) cuboids of block => commands sent"""
+    id, data, withData = _blockKey(block)
+    return sendBoxes(mc, (0, 0, 0), [box + (id, data) for box in boxes], withData)
+
+def _staircase(r):
+    """Half extents (a, b, c) of the centred cuboids which together cover
+    the sphere of radius r, see sphereBoxes"""
+    r2 = r * r + r
+    def h(i, j):
+        v = r2 - i * i - j * j
+        return _isqrt(v) if v >= 0 else -1
+    corners = []
+    for i in range(r + 1):
+        for j in range(r + 1):
+            c = h(i, j)
+            if c < 0:
+                break
+            # only keep corners no larger cuboid covers
+            if h(i + 1, j) == c or h(i, j + 1) == c:
+                continue
+            corners.append((i, j, c))
+    return corners
+
+def _disk(r):
+    """Half extents (a, b) of the centred rectangles which together cover
+    the disk of radius r"""
+    r2 = r * r + r
+    corners = []
+    for i in range(r + 1):
+        b = _isqrt(r2 - i * i)
+        if i == r or _isqrt(r2 - (i + 1) * (i + 1)) < b:
+            corners.append((i, b))
+    return corners
+
+def line(p0, p1):
+    """The blocks on the line from p0 to p1, by 3D Bresenham => [Vec3]"""
+    x0, y0, z0 = intFloor(p0)
+    x1, y1, z1 = intFloor(p1)
+    d = [abs(x1 - x0), abs(y1 - y0), abs(z1 - z0)]
+    s = [1 if x1 >= x0 else -1, 1 if y1 >= y0 else -1, 1 if z1 >= z0 else -1]
+    p = [x0, y0, z0]
+    # step along the axis which changes most, the other two follow
+    major = d.index(max(d))
+    minors = [i for i in range(3) if i != major]
+    errors = [2 * d[i] - d[major] for i in minors]
+    points = [Vec3(*p)]
+    for _ in range(d[major]):
+        p[major] += s[major]
+        for k, i in enumerate(minors):
+            if errors[k] >= 0:
+                p[i] += s[i]
+                errors[k] -= 2 * d[major]
+            errors[k] += 2 * d[i]
+        points.append(Vec3(*p))
+    return points
+
+def lineBoxes(p0, p1):
+    """The line from p0 to p1 as runs of blocks along an axis => [(x0,y0,z0,x1,y1,z1)]"""
+    boxes = []
+    run = None
+    for p in line(p0, p1):
+        p = (p.x, p.y, p.z)
+        if run is not None:
+            start, end, axis = run
+            diff = [p[i] - end[i] for i in range(3)]
+            moved = [i for i in range(3) if diff[i]]
+            if len(moved) == 1 and (axis is None or axis == moved[0]):
+                run = (start, p, moved[0])
+                continue
+            boxes.append(start + end)
+        run = (p, p, None)
+    if run is not None:
+        boxes.append(run[0] + run[1])
+    return [(min(b[0], b[3]), min(b[1], b[4]), min(b[2], b[5]),
+             max(b[0], b[3]), max(b[1], b[4]), max(b[2], b[5])) for b in boxes]
+
+def sphereBoxes(center, radius):
+    """A solid sphere of the blocks whose centres are within radius + 0.5 of
+    center => [(x0,y0,z0,x1,y1,z1)]"""
+    cx, cy, cz = intFloor(center)
+    r = int(radius)
+    return [(cx - a, cy - c, cz - b, cx + a, cy + c, cz + b)
+            for a, b, c in _staircase(r)]
+
+def cylinderBoxes(base, radius, height, axis="y"):
+    """A solid cylinder height blocks long (at least 1) along axis ("x", "y"
+    or "z") from the centre of its base => [(x0,y0,z0,x1,y1,z1)]"""
+    if axis not in ("x", "y", "z"):
+        raise ValueError("Unknown axis %s"%axis)
+    bx, by, bz = intFloor(base)
+    r = int(radius)
+    end = max(int(height), 1) - 1
+    boxes = []
+    for a, b in _disk(r):
+        if axis == "y":
+            boxes.append((bx - a, by, bz - b, bx + a, by + end, bz + b))
+        elif axis == "x":
+            boxes.append((bx, by - a, bz - b, bx + end, by + a, bz + b))
+        else:
+            boxes.append((bx - a, by - b, bz, bx + a, by + b, bz + end))
+    return boxes
+
+def shellCells(center, radius, thickness=1):
+    """The blocks of a hollow sphere, thickness blocks thick => [(x,y,z)]"""
+    cx, cy, cz = intFloor(center)
+    r = int(radius)
+    outer = r * r + r
+    inner = (r - thickness) * (r - thickness) + (r - thickness) if r - thickness >= 0 else -1
+    cells = []
+    for x in range(-r, r + 1):
+        for z in range(-r, r + 1):
+            v = outer - x * x - z * z
+            if v < 0:
+                continue
+            top = _isqrt(v)
+            w = inner - x * x - z * z
+            if w < 0:
+                # the column misses the inside
+                ys = range(-top, top + 1)
+            else:
+                bottom = _isqrt(w) + 1
+                ys = list(range(bottom, top + 1)) + list(range(-top, -bottom + 1))
+            cells.extend((cx + x, cy + y, cz + z) for y in ys)
+    return cells
+
+def polygonBoxes(points, height):
+    """A polygon in the x-z plane extruded up height blocks (at least 1)
+    from the lowest y of points => [(x0,y0,z0,x1,y1,z1)]
+
+    A block is inside if its centre is inside the polygon, and the blocks
+    on the edges are always included."""
+    points = [intFloor(p) for p in points]
+    if len(points) < 3:
+        raise ValueError("A polygon needs at least 3 points")
+    y0 = min(p[1] for p in points)
+    y1 = y0 + max(int(height), 1) - 1
+    xs = [p[0] for p in points]
+    zs = [p[2] for p in points]
+    minX, minZ = min(xs), min(zs)
+    sx, sz = max(xs) - minX + 1, max(zs) - minZ + 1
+    cells = [-1] * (sx * sz)
+    edges = list(zip(points, points[1:] + points[:1]))
+    for (ax, _, az), (bx, _, bz) in edges:
+        for p in line((ax, 0, az), (bx, 0, bz)):
+            cells[(p.x - minX) * sz + (p.z - minZ)] = 1
+    for x in range(minX, minX + sx):
+        # even-odd crossings of the row through block centres
+        crossings = sorted(az + (x - ax) * float(bz - az) / (bx - ax)
+                           for (ax, _, az), (bx, _, bz) in edges
+                           if (ax <= x < bx) or (bx <= x < ax))
+        for i in range(0, len(crossings) - 1, 2):
+            z0 = int(math.ceil(crossings[i]))
+            z1 = int(math.floor(crossings[i + 1]))
+            for z in range(max(z0, minZ), min(z1, minZ + sz - 1) + 1):
+                cells[(x - minX) * sz + (z - minZ)] = 1
+    rects = mergeBoxes(cells, (1, sx, sz), skip=-1)
+    return [(minX + x0, y0, minZ + z0, minX + x1, y1, minZ + z1)
+            for x0, _, z0, x1, _, z1, _, _ in rects]
+
+def drawLine(mc, p0, p1, block):
+    """Draw a line of block from p0 to p1 => commands sent"""
+    return _send(mc, lineBoxes(p0, p1), block)
+
+def drawSphere(mc, center, radius, block):
+    """Draw a solid sphere of block => commands sent"""
+    return _send(mc, sphereBoxes(center, radius), block)
+
+def drawHollowSphere(mc, center, radius, block, thickness=1, fill=None):
+    """Draw a sphere of block thickness blocks thick => commands sent
+
+    If fill is given (e.g. block.AIR) the inside is filled with it, which
+    takes two solid spheres and far fewer commands. Otherwise only the
+    shell is written and the inside is left as it is."""
+    if fill is not None:
+        sent = drawSphere(mc, center, radius, block)
+        if radius - thickness >= 0:
+            sent += drawSphere(mc, center, radius - thickness, fill)
+        return sent
+    id, data, _ = _blockKey(block)
+    return writeBlocks(mc, dict((cell, (id, data)) for cell in shellCells(center, radius, thickness)))
+
+def drawCylinder(mc, base, radius, height, block, axis="y"):
+    """Draw a solid cylinder of block => commands sent"""
+    return _send(mc, cylinderBoxes(base, radius, height, axis), block)
+
+def drawPolygon(mc, points, height, block):
+    """Draw a polygon of block extruded height blocks => commands sent"""
+    return _send(mc, polygonBoxes(points, height), block)
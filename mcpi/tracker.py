@@ -0,0 +1,166 @@
+import math
+from .parse import parseEntities
+
+""" Local tracking of loaded entities.
+
+    EntityTracker polls world.getEntities (or player.getEntities within a
+    radius), works out which entities were added, moved or removed since the
+    last poll and keeps them in a uniform grid, so proximity queries are
+    answered locally instead of with a server round trip each.
+
+        tracker = EntityTracker(mc)
+        added, moved, removed = tracker.update()
+        for e in tracker.within(pos, 8):
+            ...
+"""
+
+class SpatialGrid:
+    """Uniform grid of points keyed by id, for radius and nearest queries"""
+    def __init__(self, cellSize=16):
+        self.cellSize = float(cellSize)
+        self.cells = {}
+        self.points = {}
+
+    def _cell(self, x, y, z):
+        s = self.cellSize
+        return (int(math.floor(x / s)), int(math.floor(y / s)), int(math.floor(z / s)))
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, id):
+        return id in self.points
+
+    def insert(self, id, x, y, z, item=None):
+        """Add or move point id, with an optional item returned by queries"""
+        self.remove(id)
+        cell = self._cell(x, y, z)
+        self.points[id] = (x, y, z, cell, item)
+        self.cells.setdefault(cell, set()).add(id)
+
+    def remove(self, id):
+        """Remove point id if it is present"""
+        point = self.points.pop(id, None)
+        if point is not None:
+            members = self.cells[point[3]]
+            members.discard(id)
+            if not members:
+                del self.cells[point[3]]
+
+    def within(self, x, y, z, radius):
+        """Items of the points within radius of (x,y,z) => [(distance, id, item)] nearest first"""
+        r2 = radius * radius
+        cx0, cy0, cz0 = self._cell(x - radius, y - radius, z - radius)
+        cx1, cy1, cz1 = self._cell(x + radius, y + radius, z + radius)
+        found = []
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) * (cz1 - cz0 + 1) > len(self.cells):
+            # the query box covers more cells than are occupied
+            candidates = [ids for cell, ids in self.cells.items()
+                          if cx0 <= cell[0] <= cx1 and cy0 <= cell[1] <= cy1 and cz0 <= cell[2] <= cz1]
+        else:
+            candidates = [self.cells[(cx, cy, cz)]
+                          for cx in range(cx0, cx1 + 1)
+                          for cy in range(cy0, cy1 + 1)
+                          for cz in range(cz0, cz1 + 1)
+                          if (cx, cy, cz) in self.cells]
+        for ids in candidates:
+            for id in ids:
+                px, py, pz, _, item = self.points[id]
+                d2 = (px - x) * (px - x) + (py - y) * (py - y) + (pz - z) * (pz - z)
+                if d2 <= r2:
+                    found.append((d2 ** .5, id, item))
+        found.sort(key=lambda f: f[0])
+        return found
+
+    def nearest(self, x, y, z, count=1, maxDistance=None):
+        """The count nearest points to (x,y,z) => [(distance, id, item)] nearest first
+
+        Searches a radius which doubles from one cell size until it holds
+        count points, as nothing outside the radius can be nearer."""
+        if not self.points:
+            return []
+        radius = self.cellSize
+        limit = maxDistance
+        while True:
+            if limit is not None and radius >= limit:
+                return self.within(x, y, z, limit)[:count]
+            found = self.within(x, y, z, radius)
+            if len(found) >= count or len(found) == len(self.points):
+                return found[:count]
+            radius *= 2
+
+class EntityTracker:
+    """Keeps a local, spatially indexed copy of the loaded entities
+
+    update() fetches the entities and returns the changes as
+    (added, moved, removed) lists of EntityInfo. An entity counts as moved
+    when it is more than moveThreshold blocks from where it was. If
+    onChange is given it is called with the same three lists after every
+    update."""
+    def __init__(self, mc, typeId=-1, radius=None, cellSize=16, moveThreshold=0.0, onChange=None):
+        self.mc = mc
+        self.typeId = typeId
+        self.radius = radius
+        self.moveThreshold = moveThreshold
+        self.onChange = onChange
+        self.entities = {}
+        self.grid = SpatialGrid(cellSize)
+
+    def fetch(self):
+        """Fetch the current entity list from the server => [EntityInfo]
+
+        Uses player.getEntities when a radius is set, otherwise
+        world.getEntities."""
+        if self.radius is not None:
+            s = self.mc.conn.sendReceive(b"player.getEntities", self.radius, self.typeId)
+        else:
+            s = self.mc.conn.sendReceive(b"world.getEntities", self.typeId)
+        return parseEntities(s)
+
+    def update(self, entities=None):
+        """Apply a new entity list, fetching it if not given => (added, moved, removed)"""
+        if entities is None:
+            entities = self.fetch()
+        t2 = self.moveThreshold * self.moveThreshold
+        added, moved = [], []
+        seen = set()
+        for e in entities:
+            seen.add(e.id)
+            old = self.entities.get(e.id)
+            if old is None:
+                added.append(e)
+            else:
+                d2 = (e.x - old.x) ** 2 + (e.y - old.y) ** 2 + (e.z - old.z) ** 2
+                if d2 <= t2:
+                    continue
+                moved.append(e)
+            self.entities[e.id] = e
+            self.grid.insert(e.id, e.x, e.y, e.z, e)
+        removed = [e for id, e in self.entities.items() if id not in seen]
+        for e in removed:
+            del self.entities[e.id]
+            self.grid.remove(e.id)
+        if self.onChange is not None:
+            self.onChange(added, moved, removed)
+        return added, moved, removed
+
+    def get(self, id):
+        """The last known EntityInfo of entity id, or None"""
+        return self.entities.get(id)
+
+    def within(self, pos, radius, typeId=-1):
+        """Entities within radius of pos (Vec3 or x,y,z) => [EntityInfo] nearest first"""
+        x, y, z = pos
+        return [e for _, _, e in self.grid.within(x, y, z, radius)
+                if typeId == -1 or e.typeId == typeId]
+
+    def nearest(self, pos, count=1, maxDistance=None):
+        """The count entities nearest to pos (Vec3 or x,y,z) => [EntityInfo] nearest first"""
+        x, y, z = pos
+        return [e for _, _, e in self.grid.nearest(x, y, z, count, maxDistance)]
+
+    def __len__(self):
+        return len(self.entities)
+
+    def __iter__(self):
+        return iter(self.entities.values())
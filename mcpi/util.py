@@ -1,3 +1,8 @@
+import math
+from .vec3 import Vec3, FrozenVec3
+from .block import Block
+from .entity import Entity
+
 try:
     import collections.abc as collections
 except ImportError:
@@ -9,8 +14,61 @@ def flatten(l):
             for ee in flatten(e): yield ee
         else: yield e
 
+def _flatten_to_strings(out, l):
+    """
+    Appends str() of every item in l to out, flattening iterables.
+
+    The common parameter types are dispatched on their exact type, anything
+    else takes the general path used by flatten.
+    """
+    for e in l:
+        t = type(e)
+        if t is int or t is float or t is str:
+            out.append(str(e))
+        elif t is list or t is tuple:
+            _flatten_to_strings(out, e)
+        elif t is Vec3 or t is FrozenVec3:
+            out += (str(e.x), str(e.y), str(e.z))
+        elif t is Block:
+            out += (str(e.id), str(e.data))
+        elif t is Entity:
+            out.append(str(e.id))
+        elif isinstance(e, collections.Iterable) and not isinstance(e, str):
+            _flatten_to_strings(out, e)
+        else:
+            out.append(str(e))
+
 def flatten_parameters_to_bytestring(l):
-    return b",".join(map(_misc_to_bytes, flatten(l)))
+    out = []
+    _flatten_to_strings(out, l)
+    return ",".join(out).encode("UTF-8")
+
+def _flatten_to_ints(out, l):
+    """
+    Appends every item in l, floored to an int, to out, flattening iterables.
+    """
+    for e in l:
+        t = type(e)
+        if t is int:
+            out.append(e)
+        elif t is float:
+            out.append(int(math.floor(e)))
+        elif t is list or t is tuple:
+            _flatten_to_ints(out, e)
+        elif t is Vec3 or t is FrozenVec3:
+            out += (int(math.floor(e.x)), int(math.floor(e.y)), int(math.floor(e.z)))
+        elif t is Block:
+            out += (e.id, e.data)
+        elif isinstance(e, collections.Iterable) and not isinstance(e, str):
+            _flatten_to_ints(out, e)
+        else:
+            out.append(int(math.floor(e)))
+
+def flatten_to_ints(l):
+    """Flattens l into a list of ints, rounding down"""
+    out = []
+    _flatten_to_ints(out, l)
+    return out
 
 def _misc_to_bytes(m):
     """
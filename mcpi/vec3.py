@@ -1,13 +1,16 @@
-class Vec3:
+import math
+from array import array
+
+class Vec3(object):
+    __slots__ = ("x", "y", "z")
+
     def __init__(self, x=0, y=0, z=0):
         self.x = x
         self.y = y
         self.z = z
 
     def __add__(self, rhs):
-        c = self.clone()
-        c += rhs
-        return c
+        return Vec3(self.x + rhs.x, self.y + rhs.y, self.z + rhs.z)
 
     def __iadd__(self, rhs):
         self.x += rhs.x
@@ -22,9 +25,7 @@ class Vec3:
         return self.x * self.x + self.y * self.y  + self.z * self.z
 
     def __mul__(self, k):
-        c = self.clone()
-        c *= k
-        return c
+        return Vec3(self.x * k, self.y * k, self.z * k)
 
     def __imul__(self, k):
         self.x *= k
@@ -35,14 +36,21 @@ class Vec3:
     def clone(self):
         return Vec3(self.x, self.y, self.z)
 
+    def freeze(self):
+        """An immutable, hashable copy => FrozenVec3"""
+        return FrozenVec3(self.x, self.y, self.z)
+
     def __neg__(self):
         return Vec3(-self.x, -self.y, -self.z)
 
     def __sub__(self, rhs):
-        return self.__add__(-rhs)
+        return Vec3(self.x - rhs.x, self.y - rhs.y, self.z - rhs.z)
 
     def __isub__(self, rhs):
-        return self.__iadd__(-rhs)
+        self.x -= rhs.x
+        self.y -= rhs.y
+        self.z -= rhs.z
+        return self
 
     def __repr__(self):
         return "Vec3(%s,%s,%s)"%(self.x,self.y,self.z)
@@ -65,10 +73,17 @@ class Vec3:
         return 0
 
     def __eq__(self, rhs):
-        if self.x == rhs.x and self.y == rhs.y and self.z == rhs.z:
-            return True
+        try:
+            return self.x == rhs.x and self.y == rhs.y and self.z == rhs.z
+        except AttributeError:
+            return NotImplemented
 
-        return False
+    def __ne__(self, rhs):
+        eq = self.__eq__(rhs)
+        return eq if eq is NotImplemented else not eq
+
+    # mutable, so not hashable, see freeze()
+    __hash__ = None
 
     def iround(self): self._map(lambda v:int(v+0.5))
     def ifloor(self): self._map(int)
@@ -76,6 +91,156 @@ class Vec3:
     def rotateLeft(self):  self.x, self.z = self.z, -self.x
     def rotateRight(self): self.x, self.z = -self.z, self.x
 
+class FrozenVec3(Vec3):
+    """An immutable Vec3 which can be used in sets and as a dict key
+
+    Arithmetic returns new FrozenVec3s, the in place operators rebind the
+    name to a new FrozenVec3 like they do for tuples."""
+    __slots__ = ()
+
+    def __init__(self, x=0, y=0, z=0):
+        object.__setattr__(self, "x", x)
+        object.__setattr__(self, "y", y)
+        object.__setattr__(self, "z", z)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("FrozenVec3 is immutable")
+
+    def __reduce__(self):
+        # copy and pickle would restore the slots through __setattr__
+        return (FrozenVec3, (self.x, self.y, self.z))
+
+    def __hash__(self):
+        return hash((self.x, self.y, self.z))
+
+    def __add__(self, rhs):
+        return FrozenVec3(self.x + rhs.x, self.y + rhs.y, self.z + rhs.z)
+
+    def __sub__(self, rhs):
+        return FrozenVec3(self.x - rhs.x, self.y - rhs.y, self.z - rhs.z)
+
+    def __mul__(self, k):
+        return FrozenVec3(self.x * k, self.y * k, self.z * k)
+
+    def __neg__(self):
+        return FrozenVec3(-self.x, -self.y, -self.z)
+
+    __iadd__ = __add__
+    __isub__ = __sub__
+    __imul__ = __mul__
+
+    def freeze(self):
+        return self
+
+    def __repr__(self):
+        return "FrozenVec3(%s,%s,%s)"%(self.x,self.y,self.z)
+
+class Vec3Array(object):
+    """Many positions held in one contiguous array('d') as x,y,z triples
+
+    The batch operations work on every position at once without creating a
+    Vec3 per position."""
+    __slots__ = ("data",)
+
+    def __init__(self, positions=()):
+        self.data = array("d")
+        for p in positions:
+            self.data.extend(p)
+        if len(self.data) % 3:
+            raise ValueError("positions must have 3 components")
+
+    @staticmethod
+    def fromArray(data):
+        """Wrap an existing array('d') of x,y,z triples without copying"""
+        a = Vec3Array()
+        a.data = data
+        return a
+
+    def __len__(self):
+        return len(self.data) // 3
+
+    def _index(self, i):
+        n = len(self)
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError("Vec3Array index out of range")
+        return 3 * i
+
+    def __getitem__(self, i):
+        i = self._index(i)
+        d = self.data
+        return Vec3(d[i], d[i + 1], d[i + 2])
+
+    def __setitem__(self, i, v):
+        i = self._index(i)
+        v = array("d", v)
+        if len(v) != 3:
+            raise ValueError("a position must have 3 components")
+        self.data[i:i + 3] = v
+
+    def __iter__(self):
+        d = self.data
+        for i in range(0, len(d), 3):
+            yield Vec3(d[i], d[i + 1], d[i + 2])
+
+    def __repr__(self):
+        return "Vec3Array(%s)"%list(self)
+
+    def append(self, v):
+        self.data.extend(v)
+
+    def xs(self):
+        return self.data[0::3]
+
+    def ys(self):
+        return self.data[1::3]
+
+    def zs(self):
+        return self.data[2::3]
+
+    def translate(self, dx, dy=None, dz=None):
+        """Move every position by (dx,dy,dz) or a Vec3, in place"""
+        if dy is None:
+            dx, dy, dz = dx
+        d = self.data
+        for offset, delta in ((0, dx), (1, dy), (2, dz)):
+            if delta:
+                d[offset::3] = array("d", [v + delta for v in d[offset::3]])
+        return self
+
+    def rotateLeft(self):
+        """Rotate every position left about the y axis, in place"""
+        d = self.data
+        xs = d[0::3]
+        d[0::3] = d[2::3]
+        d[2::3] = array("d", [-x for x in xs])
+        return self
+
+    def rotateRight(self):
+        """Rotate every position right about the y axis, in place"""
+        d = self.data
+        zs = d[2::3]
+        d[2::3] = d[0::3]
+        d[0::3] = array("d", [-z for z in zs])
+        return self
+
+    def floor(self):
+        """Round every component down => array('l') of x,y,z triples"""
+        floor = math.floor
+        return array("l", [int(floor(v)) for v in self.data])
+
+    def distanceSqr(self, to):
+        """Squared distance from every position to a Vec3 => array('d')"""
+        tx, ty, tz = to
+        d = self.data
+        return array("d", [(x - tx) * (x - tx) + (y - ty) * (y - ty) + (z - tz) * (z - tz)
+                           for x, y, z in zip(d[0::3], d[1::3], d[2::3])])
+
+    def distance(self, to):
+        """Distance from every position to a Vec3 => array('d')"""
+        return array("d", [v ** .5 for v in self.distanceSqr(to)])
+
 def testVec3():
     # Note: It's not testing everything
 
@@ -110,5 +275,26 @@ def testVec3():
     e = eval(repr(it))
     assert e == it
 
+    # 4.1 Hashing frozen vectors
+    f = it.freeze()
+    assert f == it
+    assert f in set([Vec3(2, -2, 3).freeze()])
+    try:
+        f.x = 0
+        assert False
+    except AttributeError:
+        pass
+    f += Vec3(1, 1, 1)
+    assert f == FrozenVec3(3, -1, 4)
+
+    # 5.1 Vec3Array
+    va = Vec3Array([a, b])
+    va.translate(1, 2, 3)
+    assert va[0] == Vec3(11, -1, 7)
+    va.rotateLeft()
+    assert va[1] == Vec3(5, 3, 6)
+    assert list(va.floor()) == [7, -1, -11, 5, 3, 6]
+    assert va.distance(va[0])[0] == 0
+
 if __name__ == "__main__":
     testVec3()
@@ -0,0 +1,141 @@
+from .connection import Connection
+from .minecraft import intFloor
+
+""" Bulk voxel writes: stamp a dense 3D array of blocks into the world using
+    as few world.setBlocks commands as possible.
+
+    Arrays are indexed [y][x][z], with z changing fastest, which is the same
+    order as the world.getBlocks reply. A NumPy array of shape
+    (height, width, depth) can be passed directly, any other flat sequence
+    of ids (a list, array('H'), ...) needs its shape passed with it.
+
+        from array import array
+        blocks = array('H', [1] * (10 * 10 * 10))
+        setVoxels(mc, (0, 0, 0), blocks, shape=(10, 10, 10))
+"""
+
+def _flat(values, shape):
+    """Returns values as a flat list of ints and the (y, x, z) shape"""
+    if shape is None:
+        shape = values.shape
+    if hasattr(values, "ravel"):
+        values = values.ravel().tolist()
+    else:
+        values = list(values)
+    sy, sx, sz = shape
+    if len(values) != sy * sx * sz:
+        raise ValueError("%d values do not fit shape %s"%(len(values), shape))
+    return values, (sy, sx, sz)
+
+def mergeBoxes(blocks, shape=None, data=None, skip=None, previous=None, previousData=None):
+    """Break a 3D array of block ids into axis aligned solid cuboids
+    => [(x0,y0,z0,x1,y1,z1,id,data)] relative to the array origin
+
+    blocks, data, previous and previousData are flat [y][x][z] arrays or
+    NumPy arrays of the same shape. skip is an id, or a collection of ids,
+    which are left as they are in the world (e.g. skip=0 for air). If
+    previous holds the current contents of the world, unchanged cells are
+    not written, though a cuboid may still cover them when that lets it
+    grow."""
+    ids, (sy, sx, sz) = _flat(blocks, shape)
+    n = len(ids)
+    if data is not None:
+        datas, _ = _flat(data, (sy, sx, sz))
+        keys = [(i << 8) | d for i, d in zip(ids, datas)]
+    else:
+        keys = [i << 8 for i in ids]
+
+    if skip is not None:
+        if isinstance(skip, int):
+            skip = (skip,)
+        skip = set(skip)
+        keys = [-1 if i in skip else k for i, k in zip(ids, keys)]
+
+    # avail marks cells a cuboid may cover, required marks cells which must be
+    # covered. Unchanged cells are available but not required.
+    avail = bytearray(b"\x01") * n
+    if previous is not None:
+        old, _ = _flat(previous, (sy, sx, sz))
+        if previousData is not None:
+            oldData, _ = _flat(previousData, (sy, sx, sz))
+            oldKeys = [(i << 8) | d for i, d in zip(old, oldData)]
+        else:
+            oldKeys = [i << 8 for i in old]
+        required = bytearray(k >= 0 and k != o for k, o in zip(keys, oldKeys))
+    else:
+        required = bytearray(k >= 0 for k in keys)
+
+    layer = sx * sz
+    boxes = []
+    i = required.find(b"\x01")
+    while i >= 0:
+        if not avail[i]:
+            i = required.find(b"\x01", i + 1)
+            continue
+        k = keys[i]
+        y, rem = divmod(i, layer)
+        x, z = divmod(rem, sz)
+
+        # grow along z
+        z1 = z
+        while z1 + 1 < sz and keys[i + z1 + 1 - z] == k and avail[i + z1 + 1 - z]:
+            z1 += 1
+        w = z1 - z + 1
+        run = [k] * w
+        ones = b"\x01" * w
+
+        def rowFits(j):
+            return keys[j:j + w] == run and avail[j:j + w] == ones
+
+        # grow along x
+        x1 = x
+        while x1 + 1 < sx and rowFits((y * sx + x1 + 1) * sz + z):
+            x1 += 1
+
+        # grow along y
+        y1 = y
+        while y1 + 1 < sy and all(rowFits(((y1 + 1) * sx + xx) * sz + z)
+                                  for xx in range(x, x1 + 1)):
+            y1 += 1
+
+        zeros = bytes(bytearray(w))
+        for yy in range(y, y1 + 1):
+            for xx in range(x, x1 + 1):
+                j = (yy * sx + xx) * sz + z
+                avail[j:j + w] = zeros
+                required[j:j + w] = zeros
+
+        boxes.append((x, y, z, x1, y1, z1, k >> 8, k & 0xff))
+        i = required.find(b"\x01", i + 1)
+    return boxes
+
+def sendBoxes(mc, origin, boxes, withData=True):
+    """Send cuboids from mergeBoxes to the world at origin => commands sent
+
+    Single blocks are sent with world.setBlock, everything else with
+    world.setBlocks. On a plain Connection the commands are buffered and
+    written in large batches."""
+    ox, oy, oz = intFloor(origin)
+
+    def send():
+        for x0, y0, z0, x1, y1, z1, id, data in boxes:
+            block = (id, data) if withData else (id,)
+            if x0 == x1 and y0 == y1 and z0 == z1:
+                mc.setBlock(ox + x0, oy + y0, oz + z0, block)
+            else:
+                mc.setBlocks(ox + x0, oy + y0, oz + z0, ox + x1, oy + y1, oz + z1, block)
+
+    if isinstance(mc.conn, Connection):
+        with mc.conn:
+            send()
+    else:
+        send()
+    return len(boxes)
+
+def setVoxels(mc, origin, blocks, shape=None, data=None, skip=None, previous=None, previousData=None):
+    """Write a 3D array of blocks into the world at origin (x,y,z) using as
+    few setBlocks commands as possible => commands sent
+
+    See mergeBoxes for the arguments."""
+    boxes = mergeBoxes(blocks, shape, data, skip, previous, previousData)
+    return sendBoxes(mc, origin, boxes, withData=data is not None)
@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from mcpi.minecraft import Minecraft
+from mcpi.mockserver import MockServer
+
+@pytest.fixture
+def server():
+    with MockServer() as server:
+        yield server
+
+@pytest.fixture
+def mc(server):
+    mc = Minecraft.create(server.address, server.port)
+    yield mc
+    mc.conn.close()
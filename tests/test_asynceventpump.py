@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from mcpi.asyncminecraft import AsyncMinecraft
+from mcpi.asynceventpump import AsyncEventPump
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+def test_dispatches_events(server):
+    async def main():
+        mc = await AsyncMinecraft.create(server.address, server.port)
+        pump = AsyncEventPump(mc, interval=0.01)
+        got = []
+        async def handler(e):
+            got.append(e)
+        pump.onChatPost(handler)
+        await mc.getBlock(0, 0, 0)
+        pump.start()
+        server.postChat("hello")
+        for _ in range(100):
+            if got:
+                break
+            await asyncio.sleep(0.01)
+        await pump.stop()
+        await mc.close()
+        return got
+    assert [e.message for e in run(main())] == ["hello"]
+
+def test_handler_error_stops_pump(server):
+    async def main():
+        mc = await AsyncMinecraft.create(server.address, server.port)
+        pump = AsyncEventPump(mc, interval=0.01)
+        pump.onBlockHit(lambda e: 1 / 0)
+        await mc.getBlock(0, 0, 0)
+        pump.start()
+        server.hitBlock(1, 2, 3)
+        for _ in range(100):
+            if not pump.running:
+                break
+            await asyncio.sleep(0.01)
+        assert not pump.running
+        assert isinstance(pump.error, ZeroDivisionError)
+        with pytest.raises(ZeroDivisionError):
+            await pump.dispatch()
+        await pump.stop()
+        await mc.close()
+    run(main())
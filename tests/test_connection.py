@@ -0,0 +1,76 @@
+import time
+
+import pytest
+
+from mcpi.connection import Connection, RequestError
+
+def test_pipeline_replies_in_order(mc, server):
+    for x in range(4):
+        mc.setBlock(x, x, 0, 1)
+    with mc.conn.pipeline() as pipe:
+        heights = [pipe.sendReceive(b"world.getHeight", x, 0) for x in range(4)]
+    assert [int(h.result()) for h in heights] == [0, 1, 2, 3]
+    assert server.commands["world.getHeight"] == 4
+
+def test_pipeline_failure_is_per_reply(mc):
+    with mc.conn.pipeline() as pipe:
+        before = pipe.sendReceive(b"world.getBlock", 0, 0, 0)
+        failed = pipe.sendReceive(b"world.noSuchCommand")
+        after = pipe.sendReceive(b"world.getBlock", 0, -1, 0)
+    assert before.result() == "0"
+    with pytest.raises(RequestError):
+        failed.result()
+    assert after.result() == "1"
+    # the connection is still usable
+    assert mc.getBlock(0, -1, 0) == 1
+
+def test_send_receive_many(mc):
+    assert mc.conn.sendReceiveMany([(b"world.getHeight", 0, 0), (b"world.getBlock", 0, -1, 0)]) == ["-1", "1"]
+
+def test_buffered_until_size(server):
+    conn = Connection(server.address, server.port, bufferSize=1000)
+    try:
+        conn.send(b"world.setBlock", 0, 0, 0, 1)
+        time.sleep(0.1)
+        assert server.commands["world.setBlock"] == 0
+        for i in range(100):
+            conn.send(b"world.setBlock", i, 0, 0, 1)
+        time.sleep(0.1)
+        assert server.commands["world.setBlock"] > 0
+    finally:
+        conn.close()
+
+def test_request_flushes_buffer(server):
+    conn = Connection(server.address, server.port, bufferSize=65536)
+    try:
+        conn.send(b"world.setBlock", 5, 5, 5, 2)
+        assert conn.sendReceive(b"world.getBlock", 5, 5, 5) == "2"
+    finally:
+        conn.close()
+
+def test_with_block_batches(server):
+    conn = Connection(server.address, server.port)
+    try:
+        with conn:
+            for i in range(10):
+                conn.send(b"world.setBlock", i, 0, 0, 3)
+            time.sleep(0.1)
+            assert server.commands["world.setBlock"] == 0
+        assert conn.sendReceive(b"world.getBlock", 9, 0, 0) == "3"
+        assert server.commands["world.setBlock"] == 10
+    finally:
+        conn.close()
+
+def test_flush_interval_without_more_commands(server):
+    conn = Connection(server.address, server.port, bufferSize=65536, flushInterval=0.05)
+    try:
+        conn.send(b"world.setBlock", 1, 1, 1, 4)
+        time.sleep(0.02)
+        assert server.commands["world.setBlock"] == 0
+        deadline = time.time() + 2
+        while not server.commands["world.setBlock"] and time.time() < deadline:
+            time.sleep(0.01)
+        assert server.commands["world.setBlock"] == 1
+        assert not conn._wbuf
+    finally:
+        conn.close()
@@ -0,0 +1,62 @@
+import time
+
+from mcpi import block
+from mcpi.editsession import EditSession
+
+def blockAt(mc, x, y, z):
+    b = mc.getBlockWithData(x, y, z)
+    return (b.id, b.data)
+
+def test_commit_writes_only_changes(mc, server):
+    mc.setBlocks(0, 0, 0, 4, 0, 4, block.STONE.id)
+    session = EditSession(mc)
+    session.setBlocks(0, 0, 0, 4, 1, 4, block.STONE)
+    assert session.commit() == 25
+    assert blockAt(mc, 2, 1, 2) == (1, 0)
+    session.setBlocks(0, 0, 0, 4, 1, 4, block.STONE)
+    assert session.commit() == 0
+    assert len(session.history) == 1
+
+def test_undo_redo(mc):
+    mc.setBlock(3, 3, 3, block.WOOL.id, 14)
+    with EditSession(mc) as session:
+        session.setBlock(3, 3, 3, block.STONE)
+        session.setBlock(4, 3, 3, block.GOLD_BLOCK)
+    assert blockAt(mc, 3, 3, 3) == (1, 0)
+    assert session.undo()
+    assert blockAt(mc, 3, 3, 3) == (35, 14)
+    assert blockAt(mc, 4, 3, 3) == (0, 0)
+    assert session.redo()
+    assert blockAt(mc, 4, 3, 3) == (41, 0)
+    assert not session.redo()
+
+def test_data_only_change_is_written(mc):
+    mc.setBlock(0, 5, 0, block.WOOL.id, 14)
+    session = EditSession(mc)
+    session.setBlock(0, 5, 0, block.WOOL.id, 0)
+    assert session.commit() == 1
+    assert blockAt(mc, 0, 5, 0) == (35, 0)
+    session.undo()
+    assert blockAt(mc, 0, 5, 0) == (35, 14)
+
+def test_rollback_on_exception(mc):
+    session = EditSession(mc)
+    try:
+        with session:
+            session.setBlock(0, 5, 0, block.STONE)
+            raise KeyError
+    except KeyError:
+        pass
+    assert blockAt(mc, 0, 5, 0) == (0, 0)
+    assert not session.history
+
+def test_sparse_edit_is_not_merged_over_its_bounding_box(mc, server):
+    session = EditSession(mc)
+    session.setBlock(0, 0, 0, block.STONE)
+    session.setBlock(2000, 0, 2000, block.STONE)
+    start = time.time()
+    assert session.commit() == 2
+    assert session.undo()
+    assert time.time() - start < 0.5
+    mc.getBlock(0, 0, 0)
+    assert server.commands["world.setBlock"] + server.commands["world.setBlocks"] == 4
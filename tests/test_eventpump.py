@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+from mcpi.eventpump import EventPump, PlayerEventPump
+from mcpi.event import BlockEvent
+
+def wait(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def test_poll_and_dispatch(server):
+    pump = EventPump.create(server.address, server.port)
+    got = []
+    pump.onBlockHit(got.append)
+    pump.onChatPost(got.append)
+    pump.mc.getBlock(0, 0, 0)
+    server.hitBlock(1, 2, 3)
+    server.postChat("hi")
+    assert pump.poll() == 2
+    assert pump.dispatch() == 2
+    assert isinstance(got[0], BlockEvent) and got[1].message == "hi"
+    pump.mc.conn.close()
+
+def test_drops_when_full(server):
+    pump = EventPump.create(server.address, server.port, maxQueue=2)
+    pump.mc.getBlock(0, 0, 0)
+    for i in range(5):
+        server.hitBlock(i, 0, 0)
+    assert pump.poll() == 2
+    assert pump.dropped == 3
+    pump.mc.conn.close()
+
+def test_background_dispatch(server):
+    pump = EventPump.create(server.address, server.port, interval=0.01)
+    got = []
+    pump.onChatPost(got.append)
+    with pump.start(dispatch=True):
+        time.sleep(0.05)
+        server.postChat("one")
+        assert wait(lambda: got)
+    assert got[0].message == "one"
+
+def test_handler_error_stops_pump(server):
+    pump = EventPump.create(server.address, server.port, interval=0.01)
+    pump.onChatPost(lambda e: 1 / 0)
+    pump.start(dispatch=True)
+    try:
+        time.sleep(0.05)
+        server.postChat("boom")
+        assert wait(lambda: not pump.running)
+        assert isinstance(pump.error, ZeroDivisionError)
+        with pytest.raises(ZeroDivisionError):
+            pump.dispatch()
+    finally:
+        pump.stop()
+
+def test_player_pump(server):
+    pump = PlayerEventPump.create(server.address, server.port)
+    server.world.addPlayer("second")
+    pump.mc.getBlock(0, 0, 0)
+    server.postChat("hello")
+    assert pump.poll() == 1
+    assert len(pump.players) == 2
+    pump.mc.conn.close()
+
+def test_player_pump_no_players(server):
+    for player in server.world.players():
+        server.world.removeEntities([player])
+    pump = PlayerEventPump.create(server.address, server.port)
+    assert pump.poll() == 0
+    assert pump.players == {}
+    pump.mc.conn.close()
+
+def test_player_pump_player_leaves(server):
+    second = server.world.addPlayer("second")
+    pump = PlayerEventPump.create(server.address, server.port, minInterval=0)
+    pump.poll()
+    assert second in pump.players
+    server.world.removeEntities([server.world.entities[second]])
+    server.postChat("still here")
+    assert pump.poll() == 1
+    assert second not in pump.players
+    assert len(pump.players) == 1
+    pump.mc.conn.close()
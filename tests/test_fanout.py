@@ -0,0 +1,53 @@
+import socket
+
+from mcpi import block
+from mcpi.fanout import FanOut
+from mcpi.mockserver import MockServer
+
+def test_mirrors_commands(server):
+    with MockServer() as other:
+        fan = FanOut([(server.address, server.port), "%s:%d" % (other.address, other.port)])
+        try:
+            mc = fan.minecraft()
+            mc.setBlocks(0, 0, 0, 3, 3, 3, block.STONE.id)
+            replies = fan.query(b"world.getBlock", 2, 2, 2)
+            assert [r.reply for r in replies.values()] == ["1", "1"]
+            assert fan.sendReceiveBytes(b"world.getHeight", 1, 1) == b"3"
+            assert [r.reply for r in fan.lastReplies.values()] == [b"3", b"3"]
+        finally:
+            fan.close()
+
+def test_reconnect_with_reply_waiting(server):
+    s = socket.socket()
+    s.bind(("localhost", 0))
+    port = s.getsockname()[1]
+    s.close()
+    fan = FanOut(["localhost:%d" % server.port, "localhost:%d" % port], timeout=0.5)
+    try:
+        assert len(fan.live) == 1
+        # leaves a Fail waiting on the live game
+        fan.send(b"no.such.command")
+        with MockServer(port=port):
+            assert fan.reconnect() == ["localhost:%d" % port]
+            fan.send(b"world.setBlock", 1, 2, 3, 4)
+            replies = fan.query(b"world.getBlock", 1, 2, 3)
+            assert [r.reply for r in replies.values()] == ["4", "4"]
+    finally:
+        fan.close()
+
+def test_no_selector_per_command(server, monkeypatch):
+    from mcpi import fanout
+    fan = FanOut([(server.address, server.port)])
+    made = []
+    real = fanout.selectors.DefaultSelector
+    def counting():
+        made.append(1)
+        return real()
+    monkeypatch.setattr(fanout.selectors, "DefaultSelector", counting)
+    try:
+        for x in range(100):
+            fan.send(b"world.setBlock", x, 0, 0, 1)
+        assert fan.sendReceive(b"world.getBlock", 99, 0, 0) == "1"
+        assert made == []
+    finally:
+        fan.close()
@@ -0,0 +1,21 @@
+from mcpi import block
+from mcpi.cache import CachedMinecraft
+from mcpi.heightmap import HeightMap, heightAfter
+
+def test_height_after():
+    assert heightAfter(5, 7, 9, 1) == 9
+    assert heightAfter(5, 2, 3, 1) == 5
+    assert heightAfter(5, 5, 5, 0) is None
+    assert heightAfter(5, 6, 8, 0) == 5
+
+def test_caches_agree(server):
+    mc = CachedMinecraft.create(server.address, server.port)
+    heights = HeightMap(mc)
+    mc.setBlocks(0, 0, 0, 3, 2, 3, block.STONE.id)
+    assert heights.heights(0, 0, 3, 3).max() == mc.getHeight(1, 1) == 2
+    for args in [(1, 5, 1, block.STONE.id), (1, 5, 1, block.AIR.id), (2, 1, 2, block.AIR.id)]:
+        mc.setBlock(*args)
+        heights.blockChanged(*args)
+    for x, z in [(1, 1), (2, 2), (3, 3)]:
+        assert heights.heights(x, z, x, z).max() == mc.getHeight(x, z) == server.world.getHeight(x, z)
+    mc.conn.close()
@@ -0,0 +1,33 @@
+import pytest
+
+from mcpi import block, entity
+from mcpi.connection import RequestError
+
+def test_blocks(mc, server):
+    mc.setBlocks(0, 0, 0, 3, 3, 3, block.WOOL.id, 14)
+    assert mc.getBlock(1, 1, 1) == 35
+    assert server.world.getBlock(2, 2, 2) == (35, 14)
+    assert mc.getBlockWithData(1, 1, 1) == block.Block(35, 14)
+    assert mc.getHeight(1, 1) == 3
+    assert list(mc.getBlocks(0, 0, 0, 1, 0, 1)) == [35] * 4
+
+def test_unknown_command_fails(mc):
+    with pytest.raises(RequestError):
+        mc.conn.sendReceive(b"world.noSuchCommand")
+
+def test_entity_names(mc, server):
+    player = mc.getPlayerEntityIds()[0]
+    assert mc.entity.getName(player) == "player"
+    id = mc.spawnEntity(1, 1, 1, entity.PIG.id)
+    assert mc.entity.getName(id) == "PIG"
+
+def test_events(mc, server):
+    mc.events.clearAll()
+    # wait for the server to have run it
+    mc.getBlock(0, 0, 0)
+    server.hitBlock(1, 2, 3)
+    server.postChat("hello")
+    hits = mc.events.pollBlockHits()
+    assert [(h.pos.x, h.pos.y, h.pos.z) for h in hits] == [(1, 2, 3)]
+    assert [c.message for c in mc.events.pollChatPosts()] == ["hello"]
+    assert mc.events.pollBlockHits() == []
@@ -0,0 +1,42 @@
+import os
+import socket
+
+import pytest
+
+from mcpi import block
+from mcpi.schematic import Schematic, exportRegion, importSchematic
+
+def openFiles():
+    """The open file descriptors of this process, where that can be told"""
+    if os.path.isdir("/proc/self/fd"):
+        return len(os.listdir("/proc/self/fd"))
+    return None
+
+def test_export_import(mc, server, tmp_path):
+    mc.setBlocks(0, 0, 0, 20, 3, 5, block.STONE.id)
+    mc.setBlock(7, 2, 3, block.GOLD_BLOCK.id)
+    path = str(tmp_path / "a.mcr")
+    exportRegion(mc, path, 0, 0, 0, 20, 3, 5)
+    with Schematic.open(path) as s:
+        assert s.shape == (4, 21, 6)
+        assert s.get(7, 2, 3).id == block.GOLD_BLOCK.id
+        assert importSchematic(mc, s, (100, 0, 0)) > 0
+    assert mc.getBlock(107, 2, 3) == block.GOLD_BLOCK.id
+    assert mc.getBlock(120, 3, 5) == block.STONE.id
+
+def test_export_error_is_not_hidden(mc, tmp_path):
+    mc.conn.socket.shutdown(socket.SHUT_RDWR)
+    with pytest.raises(socket.error):
+        exportRegion(mc, str(tmp_path / "b.mcr"), 0, 0, 0, 40, 40, 40)
+
+def test_open_truncated(mc, tmp_path):
+    path = str(tmp_path / "c.mcr")
+    exportRegion(mc, path, 0, 0, 0, 15, 15, 15)
+    with open(path, "rb") as f:
+        head = f.read(100)
+    with open(path, "wb") as f:
+        f.write(head)
+    fds = openFiles()
+    with pytest.raises(ValueError):
+        Schematic.open(path)
+    assert openFiles() == fds
@@ -0,0 +1,31 @@
+import copy
+import pickle
+
+import pytest
+
+from mcpi.vec3 import FrozenVec3, Vec3, Vec3Array, testVec3
+
+def test_vec3():
+    testVec3()
+
+def test_frozen_copy_and_pickle():
+    v = FrozenVec3(1, 2, 3)
+    assert copy.copy(v) == v
+    assert copy.deepcopy({v}) == {v}
+    assert pickle.loads(pickle.dumps(v)) == v
+    assert type(pickle.loads(pickle.dumps(v))) is FrozenVec3
+
+def test_array_indexing():
+    a = Vec3Array([(1, 2, 3), (4, 5, 6)])
+    assert a[-1] == Vec3(4, 5, 6)
+    assert a[-2] == Vec3(1, 2, 3)
+    for i in (2, -3):
+        with pytest.raises(IndexError):
+            a[i]
+        with pytest.raises(IndexError):
+            a[i] = (0, 0, 0)
+    a[1] = Vec3(7, 8, 9)
+    assert list(a) == [Vec3(1, 2, 3), Vec3(7, 8, 9)]
+    with pytest.raises(ValueError):
+        a[0] = (1, 2)
+    assert len(a) == 2